@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+'''
+benchmarks - Timing harness for the crop, autocrop, display and PDF paths.
+
+Run `python -m benchmarks.run -o result.json` from the source tree and
+compare two results with `python -m benchmarks.compare old.json new.json`.
+The GUI code is driven headless with the Tk pieces stubbed (stubs.py) on
+synthetic scans (synth.py).
+'''
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+'''
+compare.py - Compares two benchmark results variant by variant.
+
+Prints the p50 latency and peak RSS of both runs and their ratio; a ratio
+below 1 is an improvement. Exits with 1 if any p50 got slower than
+--threshold.
+'''
+
+import sys
+import json
+import argparse
+
+default_threshold = 1.10
+
+skip = ('n', 'unit', 'items', 'throughput', 'mean_ms', 'min_ms', 'p50_ms',
+        'p90_ms', 'p99_ms', 'max_ms', 'start_rss_kb', 'peak_rss_kb')
+
+
+def variant_key(result):
+    return tuple(sorted((k, str(v)) for k, v in result.items() if k not in skip))
+
+
+def load(filename):
+    with open(filename) as f:
+        data = json.load(f)
+    return data, dict((variant_key(r), r) for r in data['results'])
+
+
+def ratio(new, old):
+    if not old or new is None:
+        return None
+    return float(new) / old
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.compare',
+        description='Compare two benchmark json files')
+    parser.add_argument('old', help='baseline result')
+    parser.add_argument('new', help='new result')
+    parser.add_argument(
+        '-t',
+        '--threshold',
+        metavar='ratio',
+        type=float,
+        default=default_threshold,
+        help='p50 ratio counted as a regression, default %.2f' % default_threshold)
+    args = parser.parse_args(argv)
+
+    old_data, old = load(args.old)
+    new_data, new = load(args.new)
+    print ('%s -> %s' % (old_data['environment'].get('commit'),
+                         new_data['environment'].get('commit')))
+    regressions = 0
+    for key in sorted(new):
+        if key not in old:
+            continue
+        o, n = old[key], new[key]
+        p50 = ratio(n['p50_ms'], o['p50_ms'])
+        rss = ratio(n['peak_rss_kb'], o['peak_rss_kb'])
+        mark = ''
+        if p50 and p50 > args.threshold:
+            mark = ' SLOWER'
+            regressions += 1
+        print ('%-60s %9.2f -> %9.2f ms x%.2f  rss x%s%s' % (
+            ' '.join('%s=%s' % kv for kv in key),
+            o['p50_ms'], n['p50_ms'], p50 or 0,
+            '%.2f' % rss if rss else '?', mark))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
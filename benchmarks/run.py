@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+'''
+run.py - Times the hot paths on synthetic scans and writes JSON.
+
+Every variant (case, size, mode, ...) runs in a fresh process, so its
+peak RSS is its own. Results hold latency percentiles in milliseconds and
+throughput in the case's unit per second.
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synth import sizes, modes, scan_file
+
+timer = getattr(time, 'perf_counter', time.time)
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+default_repeat = 10
+default_sizes = 'small,a4'
+default_modes = ','.join(modes)
+formats = ('png', 'jpg', 'tif')
+
+
+def peak_rss():
+    '''Peak resident set size of this process in KiB, None if unknown.'''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024
+    return rss
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    k = (len(samples) - 1) * p / 100.0
+    i = int(k)
+    j = min(i + 1, len(samples) - 1)
+    return samples[i] + (samples[j] - samples[i]) * (k - i)
+
+
+def measure(fn, repeat, setup=None):
+    '''Run fn repeat times after one warm-up call, return the seconds.'''
+    if setup:
+        setup()
+    fn()
+    samples = []
+    for i in range(repeat):
+        if setup:
+            setup()
+        t = timer()
+        fn()
+        samples.append(timer() - t)
+    return samples
+
+
+def summary(samples, items, unit):
+    total = sum(samples)
+    ms = [s * 1000.0 for s in samples]
+    return OrderedDict([
+        ('n', len(samples)),
+        ('unit', unit),
+        ('items', items),
+        ('throughput', items * len(samples) / total if total else None),
+        ('mean_ms', sum(ms) / len(ms)),
+        ('min_ms', min(ms)),
+        ('p50_ms', percentile(ms, 50)),
+        ('p90_ms', percentile(ms, 90)),
+        ('p99_ms', percentile(ms, 99)),
+        ('max_ms', max(ms)),
+    ])
+
+
+# cases: each takes the variant parameters and returns (samples, items, unit)
+
+def case_rect(params):
+    from cropper.rect import Rect
+    n = 10000
+    w, h = sizes[params['size']]
+    base = Rect((16, 16), (400, 500))
+
+    def run():
+        for i in range(n):
+            r = Rect((i % 300, i % 200), (i % 300 + 500, i % 200 + 400))
+            s = r.scale_rect((2.5, 2.5)).valid_rect(w, h)
+            s.rescale_rect((2.5, 2.5), 10, 10)
+            s.plus_rect(base)
+    return measure(run, params['repeat']), n, 'rects'
+
+
+def case_regions(params):
+    from cropper.regions import Regions
+    n = 500
+    w, h = sizes[params['size']]
+    boxes = [(i % 300, i % 200, i % 300 + 500, i % 200 + 400) for i in range(n)]
+
+    def run():
+        # an autocrop of n boxes drawn, redrawn after a zoom and saved
+        regions = Regions()
+        regions.add_boxes(boxes, w, h)
+        regions.to_canvas((2.5, 2.5), 0, 0)
+        regions.to_canvas((1.25, 1.25), w // 4, h // 4)
+        regions.boxes()
+    return measure(run, params['repeat']), n, 'regions'
+
+
+def case_hit(params):
+    from cropper.regions import Regions
+    n = 2000
+    w, h = sizes[params['size']]
+    # a dense page: n boxes on a grid, a third of them overlapping
+    side = max(int((w * h / n) ** 0.5), 4)
+    cols = max(w // side, 1)
+    boxes = [((i % cols) * side, (i // cols) * side,
+              (i % cols) * side + side * (4 if i % 3 == 0 else 3) // 4,
+              (i // cols) * side + side * 3 // 4) for i in range(n)]
+    regions = Regions(boxes)
+    points = [((i * 7919) % w, (i * 104729) % h) for i in range(1000)]
+
+    def run():
+        for x, y in points:
+            regions.hit(x, y, 4)
+    return measure(run, params['repeat']), len(points), 'hits'
+
+
+def case_load(params):
+    from cropper.source import ImageSource
+    from cropper.gui import thumbsize
+    filename, boxes = scan_file(params['dir'], sizes[params['size']], params['mode'])
+    w, h = sizes[params['size']]
+
+    def run():
+        ImageSource(filename, thumbsize).image
+    return measure(run, params['repeat']), w * h / 1e6, 'Mpixels'
+
+
+def case_display(params):
+    import croppertk
+    from cropper.rect import Rect
+    from benchmarks.stubs import gui_app
+    filename, boxes = scan_file(params['dir'], sizes[params['size']], params['mode'])
+    app = gui_app(croppertk, filename)
+    w, h = app.w, app.h
+    if params['view'] == 'zoom':
+        app.region_rect = Rect((w // 4, h // 4), (w * 3 // 4, h * 3 // 4))
+
+    def setup():
+        # cold preview: crop and thumbnail every time
+        app.preview_cache.clear()
+        app.photoimage = None
+        app.view_rect = None
+    return measure(app.displayimage, params['repeat'], setup), 1, 'frames'
+
+
+def case_autocrop(params):
+    import croppertk
+    from benchmarks.stubs import gui_app
+    filename, boxes = scan_file(params['dir'], sizes[params['size']], params['mode'],
+                                params['layout'])
+    app = gui_app(croppertk, filename, acallmode=params['multi'])
+    app.image
+
+    def setup():
+        app.overlay.clear()
+        app.crop_rects.clear()
+        app.n = 0
+    w, h = sizes[params['size']]
+    return measure(app.autocrop, params['repeat'], setup), w * h / 1e6, 'Mpixels'
+
+
+def case_crop(params):
+    import croppertk
+    from cropper.rect import Rect
+    from benchmarks.stubs import gui_app
+    filename, boxes = scan_file(params['dir'], sizes[params['size']], params['mode'])
+    app = gui_app(croppertk, filename)
+    image = app.image
+    rects = [Rect(b[:2], b[2:]) for b in boxes]
+    base = os.path.splitext(filename)[0]
+
+    def run():
+        for i, r in enumerate(rects):
+            app.crop(r, ['%s__bench__%d.%s' % (base, i, params['format'])], image)
+    return measure(run, params['repeat']), len(rects), 'crops'
+
+
+def case_pdf(params):
+    import croppertktopdf
+    from cropper.rect import Rect
+    from cropper.regions import Regions
+    from cropper.sidecar import sidecar_name
+    from benchmarks.stubs import gui_app
+    filename, boxes = scan_file(params['dir'], sizes[params['size']], params['mode'],
+                                params['layout'])
+    app = gui_app(croppertktopdf, filename, ext=params['format'],
+                  savefiles=params['savefiles'],
+                  settings={'classify': params['classify']})
+    app.image
+    rects = [Rect(b[:2], b[2:]) for b in boxes]
+
+    def setup():
+        app.book = None
+        app.crop_rects = Regions(rects)
+
+    def run():
+        app.start_cropping()
+        app.exporter.wait()
+    try:
+        return measure(run, params['repeat'], setup), 1, 'pages'
+    finally:
+        # the next variant on this scan must not load these boxes
+        if os.path.exists(sidecar_name(filename)):
+            os.remove(sidecar_name(filename))
+
+
+cases = OrderedDict([
+    ('rect', case_rect),
+    ('regions', case_regions),
+    ('hit', case_hit),
+    ('load', case_load),
+    ('display', case_display),
+    ('autocrop', case_autocrop),
+    ('crop', case_crop),
+    ('pdf', case_pdf),
+])
+
+
+def variants(names, size_names, mode_names):
+    for name in names:
+        if name in ('rect', 'regions', 'hit'):
+            yield name, {'size': size_names[0]}
+            continue
+        for size in size_names:
+            for mode in mode_names:
+                p = {'size': size, 'mode': mode}
+                if name == 'display':
+                    for view in ('full', 'zoom'):
+                        yield name, dict(p, view=view)
+                elif name == 'autocrop':
+                    for layout in ('photos', 'text'):
+                        for multi in (False, True):
+                            yield name, dict(p, layout=layout, multi=multi)
+                elif name == 'crop':
+                    for f in formats:
+                        yield name, dict(p, format=f)
+                elif name == 'pdf':
+                    for layout, savefiles, classify in (('photos', False, False),
+                                                        ('photos', True, False),
+                                                        ('text', False, False),
+                                                        ('text', False, True)):
+                        yield name, dict(p, format='png', layout=layout,
+                                         savefiles=savefiles, classify=classify)
+                else:
+                    yield name, p
+
+
+def run_variant(args):
+    name, params = args
+    # the GUI code prints file names and sizes
+    sys.stdout = open(os.devnull, 'w')
+    start_rss = peak_rss()
+    samples, items, unit = cases[name](params)
+    result = OrderedDict([('case', name)])
+    result.update((k, v) for k, v in sorted(params.items())
+                  if k not in ('dir', 'repeat'))
+    result.update(summary(samples, items, unit))
+    result['start_rss_kb'] = start_rss
+    result['peak_rss_kb'] = peak_rss()
+    return result
+
+
+def environment():
+    from PIL import __version__ as pillow
+    try:
+        import numpy
+        numpy = numpy.__version__
+    except ImportError:
+        numpy = None
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+            stderr=open(os.devnull, 'w')).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return OrderedDict([
+        ('commit', commit),
+        ('time', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ('python', platform.python_version()),
+        ('pillow', pillow),
+        ('numpy', numpy),
+        ('platform', platform.platform()),
+        ('cpus', multiprocessing.cpu_count()),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Benchmark Cropper-Tk on synthetic scans')
+    parser.add_argument(
+        '-c',
+        '--cases',
+        metavar='names',
+        type=str,
+        default=','.join(cases),
+        help='comma separated cases, default %s' % ','.join(cases))
+    parser.add_argument(
+        '-s',
+        '--sizes',
+        metavar='names',
+        type=str,
+        default=default_sizes,
+        help='comma separated of %s, default %s' % (','.join(sizes), default_sizes))
+    parser.add_argument(
+        '-m',
+        '--modes',
+        metavar='modes',
+        type=str,
+        default=default_modes,
+        help='comma separated image modes, default %s' % default_modes)
+    parser.add_argument(
+        '-r',
+        '--repeat',
+        metavar='n',
+        type=int,
+        default=default_repeat,
+        help='timed runs per variant, default %d' % default_repeat)
+    parser.add_argument(
+        '-o',
+        '--outfile',
+        metavar='outfile',
+        type=str,
+        default=None,
+        help='write json here, default stdout')
+    args = parser.parse_args(argv)
+
+    names = [n for n in args.cases.split(',') if n]
+    size_names = [s for s in args.sizes.split(',') if s]
+    mode_names = [m for m in args.modes.split(',') if m]
+    for n in names:
+        if n not in cases:
+            parser.error('unknown case %s' % n)
+    for s in size_names:
+        if s not in sizes:
+            parser.error('unknown size %s' % s)
+
+    workdir = tempfile.mkdtemp(prefix='cropper-bench-')
+    results = []
+    try:
+        for name, params in variants(names, size_names, mode_names):
+            params.update(dir=workdir, repeat=args.repeat)
+            # a fresh process per variant keeps the peak RSS apart
+            pool = multiprocessing.Pool(1)
+            try:
+                result = pool.apply(run_variant, ((name, params),))
+            finally:
+                pool.close()
+                pool.join()
+            results.append(result)
+            sys.stderr.write('%-8s %-40s p50 %9.2f ms\n' % (
+                name, ' '.join('%s=%s' % (k, result[k]) for k in sorted(params)
+                               if k in result), result['p50_ms']))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    data = OrderedDict([('environment', environment()), ('results', results)])
+    text = json.dumps(data, indent=1)
+    if args.outfile:
+        with open(args.outfile, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print (text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+'''
+stubs.py - Drives the Tk Applications without a display.
+
+The Application is created without running tk.Frame.__init__; every widget
+is a Widget whose methods do nothing, and PhotoImage returns the PIL image,
+so the timed methods run the real image code and no Tk code.
+'''
+
+import os
+
+from cropper import gui
+from cropper.export import Exporter
+from cropper.overlay import Overlay
+from cropper.regions import Regions
+from cropper.session import Session
+
+
+def _noop(*args, **kwargs):
+    return 1
+
+
+class Widget(object):
+    def __getattr__(self, name):
+        return _noop
+
+
+class PhotoImage(object):
+    def __init__(self, image):
+        self.image = image
+
+
+class ImageTk(object):
+    PhotoImage = PhotoImage
+
+
+def gui_app(module, filename, **options):
+    '''An Application of module (croppertk or croppertktopdf) on filename.'''
+    gui.ImageTk = ImageTk
+    app = module.Application.__new__(module.Application)
+    app.master = Widget()
+    app.quit = _noop
+    app.after = _noop
+    app.exporter = Exporter()
+    app.export_errors = []
+    app.quitting = False
+    app.canvas = Widget()
+    app.overlay = Overlay(app.canvas)
+    for name in ('plusButton', 'undoButton', 'goButton', 'unzoomButton',
+                 'prevButton', 'nextButton', 'templateButton', 'zoomButton',
+                 'countourButton', 'acbwButton', 'acallButton',
+                 'stopButton', 'exportLabel', 'delButton', 'mergeButton'):
+        setattr(app, name, Widget())
+    app.crop_rects = Regions()
+    app.view_rect = None
+    app.image_item = None
+    app.photoimage = None
+    app.zoommode = False
+    app.countour = False
+    app.acbwmode = False
+    app.acallmode = False
+    app.zooming = False
+    app.x0 = 0
+    app.y0 = 0
+    app.scale = None
+    app.n = 0
+    app.tilecache = None
+    app.lossless = False
+    app.settings = None
+    app.exts = None
+    app.digests = {}
+    if hasattr(module, 'default_dpi'):
+        app.verify_params = _noop
+        app.dpi = module.default_dpi
+        app.ext = module.default_format
+        app.div = module.default_div
+        app.cleanmargin = module.default_cleanmargin
+        app.savefiles = True
+        app.book = None
+        app.outfile = os.path.splitext(filename)[0] + '.pdf'
+    for name, value in options.items():
+        setattr(app, name, value)
+    app.session = Session([filename], app.prepare_image)
+    app.filename = app.session.filename
+    app.loadimage()
+    return app
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+'''
+synth.py - Synthetic scans with a known layout.
+
+'photos' places a grid of textured pictures on a white page, 'text' fills
+two columns with word-sized dark blocks, 'blank' is an empty page. The
+same arguments always give the same image.
+'''
+
+import os
+import random
+
+from PIL import Image, ImageDraw
+
+sizes = {
+    'small': (1240, 1754),   # A4 at 150 dpi
+    'a4': (2480, 3508),      # A4 at 300 dpi
+    'large': (4960, 7016),   # A4 at 600 dpi
+}
+modes = ('1', 'L', 'RGB')
+layouts = ('photos', 'text', 'blank')
+file_ext = {'1': '.tif', 'L': '.jpg', 'RGB': '.jpg'}
+
+
+def _texture(size, mode, rnd):
+    w, h = size
+    bands = [Image.linear_gradient('L').resize(size).point(
+                 lambda v, o=rnd.randint(0, 96): (v // 2 + o)),
+             Image.effect_noise(size, 48)]
+    image = Image.blend(bands[0], bands[1], 0.5)
+    if mode == 'RGB':
+        image = Image.merge('RGB', (image,
+                                    image.rotate(180),
+                                    Image.effect_noise(size, 64)))
+    return image
+
+
+def make_scan(size, mode, layout='photos', seed=0):
+    '''Return (image, boxes), boxes being the content regions.'''
+    rnd = random.Random(seed)
+    w, h = size
+    work = 'RGB' if mode == 'RGB' else 'L'
+    image = Image.new(work, size, (255, 255, 255) if work == 'RGB' else 255)
+    boxes = []
+    margin = w // 16
+    if layout == 'photos':
+        cols, rows = 2, 3
+        cw = (w - margin * (cols + 1)) // cols
+        ch = (h - margin * (rows + 1)) // rows
+        for r in range(rows):
+            for c in range(cols):
+                left = margin + c * (cw + margin) + rnd.randint(0, margin // 4)
+                top = margin + r * (ch + margin) + rnd.randint(0, margin // 4)
+                pw = cw - rnd.randint(0, margin // 2)
+                ph = ch - rnd.randint(0, margin // 2)
+                image.paste(_texture((pw, ph), work, rnd), (left, top))
+                boxes.append((left, top, left + pw, top + ph))
+    elif layout == 'text':
+        draw = ImageDraw.Draw(image)
+        line = max(4, h // 110)
+        colw = (w - 3 * margin) // 2
+        for c in range(2):
+            left = margin + c * (colw + margin)
+            y = margin
+            while y + line < h - margin:
+                x = left
+                while True:
+                    ww = rnd.randint(line, line * 6)
+                    if x + ww > left + colw:
+                        break
+                    draw.rectangle((x, y, x + ww, y + line * 2 // 3), fill=0)
+                    x += ww + line // 2
+                y += line * 3 // 2
+            boxes.append((left, margin, left + colw, y))
+    if mode == '1':
+        image = image.convert('1')
+    return image, boxes
+
+
+def scan_file(dirname, size, mode, layout='photos', seed=0):
+    '''Write the scan to dirname once and return (filename, boxes).'''
+    name = '%s-%dx%d-%s-%d%s' % (layout, size[0], size[1],
+                                 mode, seed, file_ext[mode])
+    filename = os.path.join(dirname, name)
+    image, boxes = make_scan(size, mode, layout, seed)
+    if not os.path.exists(filename):
+        image.save(filename)
+    return filename, boxes
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+'''
+cropper - Headless image cropping engine shared by the Cropper-Tk front ends.
+
+Only cropper.gui, the window both front ends are built on, imports Tk;
+the rest can be used from batch scripts and on machines without a
+display. NumPy (cropper.lazy) and reportlab (cropper.pdf, cropper.book)
+are loaded by the modules that need them, when they are first used.
+'''
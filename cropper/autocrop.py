@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+'''
+autocrop.py - Finds the bounding box of the non-white content of an image.
+'''
+
+from PIL import Image, ImageFilter, ImageChops
+
+from cropper.lazy import optional
+from cropper.regions import Regions
+
+border = 255
+# autocrop_box() works on horizontal strips of at most this many pixels
+strip_pixels = 4 * 1024 * 1024
+# rows above a strip that let BW dithering settle
+bw_overlap = 32
+
+default_threshold = 240
+default_minarea = 64 * 64
+# blocks closer than this share of the longer side of the region are one
+# block: joins the words and lines of a clipping, not separate clippings
+default_mingap = 1.0 / 64
+worksize = 1024, 1024
+
+
+def _difference(image, bwmode):
+    if bwmode:
+        bw = image.convert('1')
+    else:
+        bw = image.convert('L')
+    bw = bw.filter(ImageFilter.MedianFilter)
+    bg = Image.new('1', image.size, border)
+    return ImageChops.difference(bw, bg)
+
+
+def autocrop_box(image, bwmode=False, box=None):
+    '''Return the (left, top, right, bottom) box of non-white content of
+    image, or of its region box (the result is then relative to box).
+
+    Large regions are scanned in horizontal strips of about strip_pixels,
+    overlapping by the median filter radius, so peak memory does not grow
+    with the image height. Returns None when the region is blank.
+
+    The result equals a single pass over the whole region, except in BW
+    mode on non-bilevel images: Floyd-Steinberg dithering is restarted
+    bw_overlap rows above each strip, which may move an edge by a pixel.'''
+    if box is None:
+        box = (0, 0) + image.size
+    left, top, right, bottom = box
+    height = max(strip_pixels // max(right - left, 1), 16)
+    if height >= bottom - top:
+        return _difference(image.crop(box), bwmode).getbbox()
+
+    above = bw_overlap if bwmode and image.mode != '1' else 1
+    bbox = None
+    for y0 in range(top, bottom, height):
+        y1 = min(y0 + height, bottom)
+        s0 = max(y0 - above, top)
+        s1 = min(y1 + 1, bottom)
+        diff = _difference(image.crop((left, s0, right, s1)), bwmode)
+        sb = diff.crop((0, y0 - s0, right - left, y1 - s0)).getbbox()
+        if not sb:
+            continue
+        sb = (sb[0], sb[1] + y0 - top, sb[2], sb[3] + y0 - top)
+        if bbox is None:
+            bbox = sb
+        else:
+            bbox = (min(bbox[0], sb[0]), bbox[1], max(bbox[2], sb[2]), sb[3])
+    return bbox
+
+
+def autocrop_boxes(image, box=None, bwmode=False, threshold=default_threshold,
+                   minarea=default_minarea, mingap=default_mingap, pyramid=None):
+    '''Return the boxes of all separate non-white blobs inside box.
+
+    Blobs are found by recursive row/column projections on a downscaled
+    copy (a pyramid level if one is given), then every edge is refined on
+    a narrow full resolution strip. Pixels darker than threshold are
+    content (128 in BW mode). Blobs less than mingap (a share of the
+    longer side of box) apart are joined, so a text clipping is one blob;
+    joined blobs smaller than minarea pixels are dropped. Without NumPy
+    this falls back to the single autocrop_box().'''
+    if box is None:
+        box = (0, 0) + image.size
+    if optional('numpy') is None:
+        bbox = autocrop_box(image, bwmode, box)
+        if not bbox:
+            return []
+        return [(box[0] + bbox[0], box[1] + bbox[1],
+                 box[0] + bbox[2], box[1] + bbox[3])]
+    if bwmode:
+        threshold = 128
+
+    small, factor = _small(image, box, pyramid)
+    mask = _mask(small, threshold)
+    gap = max(2, int(max(mask.shape) * mingap + 0.5))
+    blobs = []
+    _xy_cut(mask, 0, mask.shape[0], 0, mask.shape[1], gap, blobs)
+
+    boxes = []
+    for top, bottom, left, right in blobs:
+        coarse = (box[0] + int(left * factor), box[1] + int(top * factor),
+                  box[0] + int(right * factor + 0.5), box[1] + int(bottom * factor + 0.5))
+        boxes.append(_refine(image, coarse, box, int(factor + 0.999), threshold))
+    return [b for b in _join(boxes, int(gap * factor))
+            if (b[2] - b[0]) * (b[3] - b[1]) >= minarea]
+
+
+def _join(boxes, gap):
+    '''Boxes with the blobs less than gap apart replaced by the box
+    covering them; the cut misses those that are not side by side.'''
+    half = (gap + 1) // 2
+    regions = Regions((b[0] - half, b[1] - half, b[2] + half, b[3] + half)
+                      for b in boxes)
+    regions.merge_overlapping()
+    return [(b[0] + half, b[1] + half, b[2] - half, b[3] - half)
+            for b in regions.boxes()]
+
+
+def _small(image, box, pyramid):
+    '''Return a downscaled copy of box and its scale factor.'''
+    w = box[2] - box[0]
+    h = box[3] - box[1]
+    if pyramid is not None:
+        level, factor = pyramid.level_for(box, worksize)
+        if factor > 1:
+            lbox = tuple(int(v / factor + 0.5) for v in box)
+            small = level.crop(lbox)
+            return small, float(w) / max(small.size[0], 1)
+    factor = max(1, -(-max(w, h) // max(worksize)))
+    if factor == 1:
+        return image.crop(box), 1
+    if image.mode in ('1', 'P'):
+        # reduce() and resize() do not average these modes
+        image = image.crop(box).convert('L')
+        box = (0, 0, w, h)
+    if hasattr(image, 'reduce'):
+        small = image.reduce(factor, box=box)
+    else:
+        small = image.crop(box).resize((max(w // factor, 1), max(h // factor, 1)))
+    return small, float(w) / small.size[0]
+
+
+def _mask(image, threshold):
+    numpy = optional('numpy')
+    if image.mode != 'L':
+        image = image.convert('L')
+    return numpy.asarray(image) < threshold
+
+
+def _runs(profile, across, mingap):
+    '''Return [start, stop) runs where profile, counts over across
+    pixels, shows content, joining runs separated by less than mingap.'''
+    numpy = optional('numpy')
+    on = profile > across // 500
+    edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], on.view(numpy.int8), [0]))))
+    runs = []
+    for start, stop in zip(edges[::2], edges[1::2]):
+        if runs and start - runs[-1][1] < mingap:
+            runs[-1][1] = stop
+        else:
+            runs.append([start, stop])
+    return runs
+
+
+def _xy_cut(mask, top, bottom, left, right, mingap, blobs):
+    sub = mask[top:bottom, left:right]
+    rows = _runs(sub.sum(axis=1), right - left, mingap)
+    if not rows:
+        return
+    if len(rows) > 1:
+        for start, stop in rows:
+            _xy_cut(mask, top + start, top + stop, left, right, mingap, blobs)
+        return
+    top, bottom = top + rows[0][0], top + rows[0][1]
+    cols = _runs(mask[top:bottom, left:right].sum(axis=0), bottom - top, mingap)
+    if len(cols) == 1:
+        blobs.append((top, bottom, left + cols[0][0], left + cols[0][1]))
+        return
+    for start, stop in cols:
+        _xy_cut(mask, top, bottom, left + start, left + stop, mingap, blobs)
+
+
+def _edge(image, strip, threshold, axis, last):
+    '''Offset of the first (or last) content column (axis 0) or row
+    (axis 1) of strip, or None.'''
+    numpy = optional('numpy')
+    if strip[2] <= strip[0] or strip[3] <= strip[1]:
+        return None
+    mask = _mask(image.crop(strip), threshold)
+    profile = mask.sum(axis=axis)
+    found = numpy.flatnonzero(profile > mask.shape[axis] // 500)
+    if not found.size:
+        return None
+    return int(found[-1]) + 1 if last else int(found[0])
+
+
+def _refine(image, coarse, bounds, pad, threshold):
+    left, top, right, bottom = coarse
+    t = max(top - pad, bounds[1])
+    b = min(bottom + pad, bounds[3])
+    x = max(left - pad, bounds[0])
+    e = _edge(image, (x, t, min(left + pad, right), b), threshold, 0, False)
+    if e is not None:
+        left = x + e
+    x = max(right - pad, left)
+    e = _edge(image, (x, t, min(right + pad, bounds[2]), b), threshold, 0, True)
+    if e is not None:
+        right = x + e
+    y = max(top - pad, bounds[1])
+    e = _edge(image, (left, y, right, min(top + pad, bottom)), threshold, 1, False)
+    if e is not None:
+        top = y + e
+    y = max(bottom - pad, top)
+    e = _edge(image, (left, y, right, min(bottom + pad, bounds[3])), threshold, 1, True)
+    if e is not None:
+        bottom = y + e
+    return (left, top, right, bottom)
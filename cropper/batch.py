@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+'''
+batch.py - Crops many images without a GUI, spreading the work over a
+pool of processes.
+
+Each image is decoded once in a worker process; all of its crops are cut
+and saved there.
+'''
+
+import os
+import sys
+import glob
+import argparse
+import multiprocessing
+
+from PIL import Image
+
+from cropper.autocrop import (autocrop_box, autocrop_boxes,
+                              default_threshold, default_minarea)
+from cropper.deskew import AngleCache, straighten
+from cropper.encode import (add_encoder_arguments, encoder_settings,
+                            format_for, output_exts, save_formats)
+from cropper.jpegcrop import crop_grid, lossless_crop, snap_box
+from cropper.sidecar import Index, read_sidecar, spec_digest
+from cropper.spec import AUTO, SIDECAR, load_spec, rects_for
+from cropper.template import template_boxes
+
+image_exts = ('.jpg', '.jpeg', '.png', '.tif', '.tiff')
+
+
+def crop_filename(filename, filenum, ext=None):
+    f, e = os.path.splitext(filename)
+    if ext:
+        e = '.' + ext
+    return '%s__crop__%s%s' % (f, filenum, e)
+
+
+def valid_box(box, w, h):
+    left, top, right, bottom = box
+    left = min(max(left, 0), w - 1)
+    top = min(max(top, 0), h - 1)
+    right = min(max(right, 1), w)
+    bottom = min(max(bottom, 1), h)
+    return (left, top, right, bottom)
+
+
+def auto_rects(image, autoopts):
+    if autoopts.get('multi'):
+        return autocrop_boxes(image, None, autoopts.get('bwmode', False),
+                              autoopts.get('threshold', default_threshold),
+                              autoopts.get('minarea', default_minarea))
+    bbox = autocrop_box(image, autoopts.get('bwmode', False))
+    return [bbox] if bbox else []
+
+
+def resolve_rects(image, rects, autoopts):
+    '''Boxes for image from a spec entry: a list, AUTO or a template.'''
+    if rects == AUTO:
+        return auto_rects(image, autoopts)
+    if isinstance(rects, dict):
+        return template_boxes(rects, image)
+    return rects
+
+
+def _lossless(autoopts):
+    settings = autoopts.get('encoder')
+    # a straightened crop is re-encoded anyway
+    return autoopts.get('lossless') and not (settings and settings.get('deskew'))
+
+
+def save_crops(image, filename, rects, autoopts):
+    '''Cut rects from the opened image and save them as the crops of
+    filename (which need not be the file of image). Returns the names
+    saved.'''
+    settings = autoopts.get('encoder')
+    deskew = settings and settings.get('deskew')
+    lossless = _lossless(autoopts)
+    exts = autoopts.get('exts') or [None]
+    w, h = image.size
+    cache = AngleCache(filename, image.size) if deskew else None
+    # boxes start on the JPEG block grid, so that jpegtran can cut them
+    grid = lossless and crop_grid(image, [crop_filename(filename, 1, ext) for ext in exts])
+    saved = []
+    cropcount = 0
+    for box in rects:
+        cropcount += 1
+        names = [crop_filename(filename, cropcount, ext) for ext in exts]
+        box = valid_box(box, w, h)
+        if grid:
+            box = snap_box(box, grid)
+        todo = names
+        if lossless:
+            todo = [f for f in names
+                    if not (format_for(f) == 'JPEG' and lossless_crop(image, box, f))]
+        if todo:
+            if deskew:
+                newimg = straighten(image, box, cache)
+            else:
+                newimg = image.crop(box)
+            save_formats(newimg, todo, settings)
+        saved.extend(names)
+    if cache:
+        cache.save()
+    return saved
+
+
+def crop_image(job):
+    '''Worker: crop one image. job is (filename, rects, autoopts).
+
+    Returns (filename, [saved file names], error message or None).'''
+    filename, rects, autoopts = job
+    try:
+        image = Image.open(filename)
+        if not _lossless(autoopts):
+            # lossless crops on the block grid never decode the pixels
+            image.load()
+        rects = resolve_rects(image, rects, autoopts)
+        saved = save_crops(image, filename, rects, autoopts)
+    except Exception as e:
+        return filename, [], str(e)
+    return filename, saved, None
+
+
+def expand_filenames(patterns):
+    '''Expand glob patterns (for shells that do not) and directories
+    (their image files), dropping crop outputs.'''
+    filenames = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            names = [os.path.join(pattern, f) for f in sorted(os.listdir(pattern))
+                     if os.path.splitext(f)[1].lower() in image_exts]
+        else:
+            names = sorted(glob.glob(pattern)) or [pattern]
+        for name in names:
+            if '__crop__' in os.path.basename(name):
+                continue
+            if name not in seen:
+                seen.add(name)
+                filenames.append(name)
+    return filenames
+
+
+def spec_rects(spec, filename):
+    '''The spec entry of filename; 'sidecar' is replaced by its boxes.'''
+    rects = rects_for(spec, filename)
+    if rects == SIDECAR:
+        data = read_sidecar(filename)
+        rects = data and {'size': data['size'], 'rects': data['rects']}
+    return rects
+
+
+def make_jobs(filenames, spec, autoopts=None):
+    jobs = []
+    for filename in filenames:
+        rects = spec_rects(spec, filename)
+        if rects is None:
+            print ('%s: no crop spec, skipped' % filename)
+            continue
+        jobs.append((filename, rects, autoopts or {}))
+    return jobs
+
+
+def run_batch(jobs, processes=None, incremental=False, context=None, report=None):
+    '''Run jobs on a process pool; returns the number of failed images.
+
+    If incremental, images whose file and spec did not change since the
+    last run (per directory index) are skipped. context is the
+    multiprocessing start method ('spawn' from a process with threads or
+    a GUI); report(filename, message) is called for every failed image.'''
+    failed = 0
+    indexes = {}
+    digests = {}
+    if incremental:
+        todo = []
+        for job in jobs:
+            dirname = os.path.dirname(job[0])
+            if dirname not in indexes:
+                indexes[dirname] = Index(dirname)
+            digest = digests[job[0]] = spec_digest(job[1], job[2])
+            if indexes[dirname].is_current(job[0], digest):
+                print ('%s: up to date' % job[0])
+            else:
+                todo.append(job)
+        jobs = todo
+    if processes == 1 or len(jobs) < 2:
+        results = map(crop_image, jobs)
+        pool = None
+    else:
+        if context:
+            pool = multiprocessing.get_context(context).Pool(processes)
+        else:
+            pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(crop_image, jobs)
+    try:
+        for filename, saved, error in results:
+            if error:
+                failed += 1
+                print ('%s: %s' % (filename, error))
+                if report:
+                    report(os.path.basename(filename), error)
+            else:
+                for f in saved:
+                    print (f)
+                if incremental:
+                    indexes[os.path.dirname(filename)].update(
+                        filename, digests[filename], saved)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        for index in indexes.values():
+            index.save()
+    return failed
+
+
+def add_spec_arguments(parser):
+    '''Crop spec and autocrop options shared by the headless commands.'''
+    parser.add_argument(
+        '-s',
+        '--spec',
+        metavar='spec',
+        type=str,
+        default=AUTO,
+        help='crop spec: "auto", a .json or a .csv file, default auto')
+    add_autocrop_arguments(parser)
+
+
+def add_autocrop_arguments(parser):
+    parser.add_argument(
+        '--bw',
+        action='store_true',
+        help='BW mode for autocrop')
+    parser.add_argument(
+        '-m',
+        '--multi',
+        action='store_true',
+        help='autocrop every separate content block')
+    parser.add_argument(
+        '-t',
+        '--threshold',
+        metavar='threshold',
+        type=int,
+        default=default_threshold,
+        help='gray level below which a pixel is content (--multi), default 240')
+    parser.add_argument(
+        '-a',
+        '--minarea',
+        metavar='minarea',
+        type=int,
+        default=default_minarea,
+        help='smallest block in pixels (--multi), default 4096')
+
+
+def autocrop_options(args):
+    return {'bwmode': args.bw, 'multi': args.multi,
+            'threshold': args.threshold, 'minarea': args.minarea}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Cropper Image (batch mode)')
+    parser.add_argument('--batch', action='store_true',
+                        help=argparse.SUPPRESS)
+    add_spec_arguments(parser)
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        metavar='jobs',
+        type=int,
+        default=None,
+        help='worker processes, default is the number of CPUs')
+    parser.add_argument(
+        '-i',
+        '--incremental',
+        action='store_true',
+        help='skip images unchanged since the last run')
+    parser.add_argument(
+        '-r',
+        '--replay',
+        action='store_true',
+        help='crop with the saved sidecar boxes, same as -s sidecar -i')
+    parser.add_argument(
+        '-l',
+        '--lossless',
+        action='store_true',
+        help='crop jpeg files with jpegtran, without re-encoding')
+    add_encoder_arguments(parser)
+    parser.add_argument('filenames', nargs='+', help='image files, directories or globs')
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        args.spec = SIDECAR
+        args.incremental = True
+    spec = load_spec(args.spec)
+    options = autocrop_options(args)
+    if args.lossless:
+        options['lossless'] = True
+    settings = encoder_settings(args)
+    if any(settings.values()):
+        options['encoder'] = settings
+    try:
+        exts = output_exts(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if exts:
+        options['exts'] = exts
+    jobs = make_jobs(expand_filenames(args.filenames), spec, options)
+    return 1 if run_batch(jobs, args.jobs, args.incremental) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
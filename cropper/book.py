@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+'''
+book.py - Streams many page images into one multi-page PDF.
+
+All pages go through a single reportlab Canvas. A page's pixels are
+released right after showPage(), the next page is decoded in the
+background meanwhile, and crops that repeat across pages (logos,
+ornaments, blank plates) are embedded only once.
+'''
+
+import sys
+import argparse
+
+from PIL import Image
+from reportlab.pdfgen.canvas import Canvas
+
+from cropper.batch import (add_spec_arguments, autocrop_options, crop_filename,
+                           expand_filenames, resolve_rects, spec_rects, valid_box)
+from cropper.encode import add_encoder_arguments, encoder_settings
+from cropper.pdf import draw_crops, points
+from cropper.session import Session
+from cropper.spec import load_spec
+from cropper.timing import image_args, span
+
+default_dpi = 300
+default_format = 'png'
+
+
+class Book(object):
+    def __init__(self, outfile, dedupe=True, settings=None):
+        self.outfile = outfile
+        self.settings = settings
+        self.pdf = Canvas(outfile, pageCompression=1)
+        self.forms = {} if dedupe else None
+        self.pages = 0
+
+    def add_page(self, image, boxes, dpi=default_dpi, div=1, ext=default_format,
+                 filenames=None):
+        '''Add a page the size of image at dpi showing its boxes.'''
+        w, h = image.size
+        with span('add_page', crops=len(boxes), **image_args(image)):
+            self.pdf.setPageSize((points(w, dpi), points(h, dpi)))
+            draw_crops(self.pdf, image, boxes, dpi, div, ext, filenames,
+                       forms=self.forms, settings=self.settings)
+            self.pdf.showPage()
+        self.pages += 1
+
+    def save(self):
+        with span('pdf save', pages=self.pages):
+            self.pdf.save()
+
+
+def open_page(filename):
+    image = Image.open(filename)
+    image.load()
+    return image
+
+
+def build_book(outfile, filenames, spec, dpi=default_dpi, div=1,
+               ext=default_format, autoopts=None, savefiles=False, settings=None):
+    book = Book(outfile, settings=settings)
+    specs = dict((f, spec_rects(spec, f)) for f in filenames)
+    pages = [f for f in filenames if specs[f] is not None]
+    session = Session(pages, open_page, prefetch=1)
+    for index in range(len(pages)):
+        session.move(index - session.index)
+        filename = session.filename
+        image = session.get()
+        rects = resolve_rects(image, specs[filename], autoopts or {})
+        w, h = image.size
+        boxes = [valid_box(box, w, h) for box in rects]
+        names = None
+        if savefiles:
+            names = [crop_filename(filename, n + 1, ext) for n in range(len(boxes))]
+        print ('%s: %d crops' % (filename, len(boxes)))
+        book.add_page(image, boxes, dpi, div, ext, names)
+        image.close()
+        del image
+    book.save()
+    return book.pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Cropper Image to PDF (book mode)')
+    parser.add_argument(
+        '--book',
+        metavar='outfile',
+        type=str,
+        required=True,
+        help='output pdf name')
+    parser.add_argument(
+        '-d',
+        '--dpi',
+        metavar='dpi',
+        type=int,
+        default=default_dpi,
+        help='dpi for pdf output, default is 300')
+    parser.add_argument(
+        '-f',
+        '--format',
+        metavar='format',
+        type=str,
+        default=default_format,
+        help='format trim image, default png')
+    parser.add_argument(
+        '--div',
+        metavar='div',
+        type=int,
+        default=1,
+        help='divide factor for crop resolution, default 1')
+    parser.add_argument(
+        '--files',
+        action='store_true',
+        help='also save the crops as image files')
+    add_spec_arguments(parser)
+    add_encoder_arguments(parser, multi=False)
+    parser.add_argument('filenames', nargs='+', help='page images or globs')
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    pages = build_book(args.book, expand_filenames(args.filenames), spec,
+                       args.dpi, max(args.div, 1), args.format,
+                       autocrop_options(args), args.files, encoder_settings(args))
+    print ('%s: %d pages' % (args.book, pages))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
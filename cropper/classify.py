@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+'''
+classify.py - Tells bilevel, gray and colour crops apart.
+
+Scans of text pages are mostly stored as 8 or 24 bit images although
+they are black and white. classify() looks at two histograms computed in
+C by PIL: the spread between the largest and smallest channel (a colour
+pixel has a large one) and the share of mid tones (a bilevel image has
+almost none). convert() then reduces the crop to '1' (Otsu threshold,
+no dithering), 'L' or keeps it in colour.
+'''
+
+from PIL import ImageChops
+
+BILEVEL = 'bilevel'
+GRAY = 'gray'
+COLOR = 'color'
+
+chroma_level = 32      # channel spread above which a pixel is coloured
+color_ratio = 0.005    # share of coloured pixels that makes a colour crop
+dark_level = 64        # mid tones are between dark_level and light_level
+light_level = 192
+gray_ratio = 0.08      # share of mid tones that makes a gray crop
+
+
+def _share(hist, start, stop=256):
+    total = sum(hist)
+    return float(sum(hist[start:stop])) / total if total else 0.0
+
+
+def chroma(image):
+    '''Per pixel max(R, G, B) - min(R, G, B) of an RGB image, as 'L'.'''
+    r, g, b = image.split()
+    return ImageChops.subtract(ImageChops.lighter(ImageChops.lighter(r, g), b),
+                               ImageChops.darker(ImageChops.darker(r, g), b))
+
+
+def classify(image):
+    '''BILEVEL, GRAY or COLOR.'''
+    if image.mode == '1':
+        return BILEVEL
+    if image.mode == 'L':
+        gray = image
+    else:
+        rgb = image if image.mode == 'RGB' else image.convert('RGB')
+        if _share(chroma(rgb).histogram(), chroma_level) > color_ratio:
+            return COLOR
+        gray = rgb.convert('L')
+    if _share(gray.histogram(), dark_level, light_level) > gray_ratio:
+        return GRAY
+    return BILEVEL
+
+
+def otsu(hist):
+    '''Threshold between the two classes of a 256 bin histogram.'''
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_b = 0.0
+    weight_b = 0
+    best, threshold = -1.0, 127
+    for i in range(256):
+        weight_b += hist[i]
+        if weight_b == 0:
+            continue
+        weight_f = total - weight_b
+        if weight_f == 0:
+            break
+        sum_b += i * hist[i]
+        mean_b = sum_b / weight_b
+        mean_f = (sum_all - sum_b) / weight_f
+        between = weight_b * weight_f * (mean_b - mean_f) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def convert(image, kind=None):
+    '''image reduced to the mode of kind (classified if None).'''
+    kind = kind or classify(image)
+    if kind == BILEVEL:
+        if image.mode == '1':
+            return image
+        gray = image if image.mode == 'L' else image.convert('L')
+        t = otsu(gray.histogram())
+        return gray.point([255 if v > t else 0 for v in range(256)], '1')
+    if kind == GRAY:
+        return image if image.mode == 'L' else image.convert('L')
+    if image.mode not in ('RGB', 'CMYK'):
+        return image.convert('RGB')
+    return image
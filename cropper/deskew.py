@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+'''
+deskew.py - Straightens crops of clippings that lay askew on the scanner.
+
+estimate_angle() works on a gray copy of the region reduced to about
+worksize pixels: the copy is rotated through +-max_angle degrees and the
+angle whose row and column profiles change most sharply wins (text lines
+and the edges of a photo line up with the rows then). A coarse pass is
+refined around its best angle. straighten() rotates only the crop, at
+full resolution, and trims the white corners the rotation leaves.
+
+Angles are cached per image in "page.jpg.deskew.json", keyed by box, so
+the same boxes exported again are not estimated again.
+'''
+
+import json
+import threading
+
+from PIL import Image
+
+from cropper.autocrop import autocrop_box
+from cropper.pyramid import ANTIALIAS
+from cropper.sidecar import write_json
+from cropper.timing import image_args, span
+
+cache_ext = '.deskew.json'
+
+max_angle = 10.0       # degrees searched on each side
+coarse_step = 0.5
+fine_step = 0.05
+min_angle = 0.1        # smaller skews are left alone
+worksize = 512
+
+
+def _profile_score(image):
+    # sum of squared steps of the row and the column means
+    w, h = image.size
+    score = 0
+    for profile in (image.resize((1, h), Image.BOX).tobytes(),
+                    image.resize((w, 1), Image.BOX).tobytes()):
+        profile = bytearray(profile)
+        score += sum((b - a) * (b - a) for a, b in zip(profile, profile[1:]))
+    return score
+
+
+def _small(image):
+    '''Gray copy of image, content bright on black, at most worksize.'''
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('L')
+    factor = max(image.size) // worksize
+    if factor > 1 and hasattr(image, 'reduce'):
+        image = image.reduce(factor)
+    image = image.convert('L')
+    if max(image.size) > worksize:
+        image.thumbnail((worksize, worksize), ANTIALIAS)
+    # rotate() fills with black: invert so that fill is background
+    return image.point(lambda v: 255 - v)
+
+
+def _best(small, angles, resample):
+    # ties go to the smaller rotation
+    return max(angles, key=lambda a: (_profile_score(small.rotate(a, resample)), -abs(a)))
+
+
+def estimate_angle(image):
+    '''Counter-clockwise rotation in degrees that straightens image.'''
+    small = _small(image)
+    if min(small.size) < 16:
+        return 0.0
+    n = int(max_angle / coarse_step)
+    angle = _best(small, [i * coarse_step for i in range(-n, n + 1)], Image.NEAREST)
+    n = int(coarse_step / fine_step)
+    angle = _best(small, [angle + i * fine_step for i in range(-n, n + 1)], Image.BILINEAR)
+    return round(angle, 2)
+
+
+def rotate(image, angle):
+    '''image turned counter-clockwise by angle, same size, white corners.'''
+    if image.mode in ('1', 'P'):
+        image = image.convert('L' if image.mode == '1' else 'RGB')
+    white = 255 if image.mode == 'L' else (255,) * len(image.getbands())
+    return image.rotate(angle, Image.BICUBIC, fillcolor=white)
+
+
+def cache_name(filename):
+    return filename + cache_ext
+
+
+class AngleCache(object):
+    '''Skew angles of the boxes of one image, kept next to it.'''
+
+    def __init__(self, filename=None, size=None):
+        self.filename = filename
+        self.size = list(size) if size else None
+        self.angles = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        if not filename:
+            return
+        try:
+            with open(cache_name(filename)) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        # a rescan at another size has other boxes
+        if data.get('size') == self.size:
+            self.angles = data.get('angles', {})
+
+    @classmethod
+    def for_image(cls, image):
+        return cls(getattr(image, 'filename', None) or None, image.size)
+
+    def _key(self, box):
+        return ','.join(str(int(v)) for v in box)
+
+    def get(self, box):
+        with self._lock:
+            return self.angles.get(self._key(box))
+
+    def put(self, box, angle):
+        with self._lock:
+            self.angles[self._key(box)] = angle
+            self.dirty = True
+
+    def save(self):
+        with self._lock:
+            if not (self.dirty and self.filename):
+                return
+            write_json(cache_name(self.filename), {'size': self.size, 'angles': self.angles})
+            self.dirty = False
+
+
+def straighten(image, box, cache=None, trim=True):
+    '''image.crop(box) rotated so that its content is square to the
+    edges. With trim, the crop is cut down to its content afterwards;
+    without, it keeps the size of box (PDF pages place it there).'''
+    crop = image.crop(box)
+    angle = cache.get(box) if cache else None
+    if angle is None:
+        with span('deskew estimate', **image_args(crop)):
+            angle = estimate_angle(crop)
+        if cache:
+            cache.put(box, angle)
+    if abs(angle) < min_angle:
+        return crop
+    with span('deskew', angle=angle, **image_args(crop)):
+        crop = rotate(crop, angle)
+        if trim:
+            bbox = autocrop_box(crop)
+            if bbox:
+                crop = crop.crop(bbox)
+    return crop
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+'''
+encode.py - Output formats and encoder settings.
+
+Settings are a dict of save() options per PIL format, built from the
+command line by add_encoder_arguments() / encoder_settings(); missing
+options are PIL defaults. save_formats() writes one crop in several
+formats at once, the encoders running in parallel threads (they release
+the GIL). With 'classify' set, crops are first reduced to bilevel or
+gray when they are (classify.py) and bilevel TIFFs are Group 4 coded.
+'''
+
+import os
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from cropper.classify import convert
+from cropper.timing import image_args, span
+
+formats = {
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'tif': 'TIFF',
+    'tiff': 'TIFF',
+    'webp': 'WEBP',
+}
+subsamplings = {'4:4:4': 0, '4:2:2': 1, '4:2:0': 2}
+tiff_compressions = {
+    'none': None,
+    'lzw': 'tiff_lzw',
+    'deflate': 'tiff_adobe_deflate',
+    'group4': 'group4',
+}
+
+_pool = None
+_pool_pid = None
+
+
+def format_for(filename):
+    '''PIL format name from the extension of filename, None if unknown.'''
+    ext = os.path.splitext(filename)[1].lower().lstrip('.')
+    return formats.get(ext)
+
+
+def prepare(image, settings):
+    '''image reduced to its class if the settings ask for it.'''
+    if settings and settings.get('classify') and not settings.get('classified'):
+        with span('classify', **image_args(image)):
+            return convert(image)
+    return image
+
+
+def save_options(image, fmt, settings):
+    '''(image converted for fmt, save() keyword arguments).'''
+    options = dict((settings or {}).get(fmt, {}))
+    if (fmt == 'TIFF' and image.mode == '1' and 'compression' not in options and
+            settings and settings.get('classify')):
+        options['compression'] = 'group4'
+    if fmt == 'JPEG' and image.mode not in ('L', 'RGB', 'CMYK'):
+        image = image.convert('L' if image.mode in ('1', 'LA') else 'RGB')
+    elif fmt == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    elif fmt == 'TIFF' and options.get('compression') == 'group4' and image.mode != '1':
+        # group4 is bilevel only, other images are deflated
+        options['compression'] = 'tiff_adobe_deflate'
+    if options.get('compression', 0) is None:
+        del options['compression']
+    return image, options
+
+
+def save(image, filename, settings=None):
+    '''image.save(filename) with the settings of its format.'''
+    fmt = format_for(filename)
+    image, options = save_options(prepare(image, settings), fmt, settings)
+    with span('save', format=fmt, **image_args(image)):
+        image.save(filename, fmt, **options)
+
+
+def pool():
+    global _pool, _pool_pid
+    # a forked child inherits the pool but not its threads: make its own
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ThreadPool(multiprocessing.cpu_count())
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def save_formats(image, filenames, settings=None):
+    '''Save one image to every file of filenames (one per format).'''
+    if len(filenames) == 1:
+        save(image, filenames[0], settings)
+        return
+    # classify and load once, before the threads share it
+    image = prepare(image, settings)
+    image.load()
+    settings = dict(settings or {}, classified=True)
+    pool().map(lambda f: save(image, f, settings), filenames)
+
+
+def add_encoder_arguments(parser, multi=True):
+    '''Encoder options shared by the commands, and --formats if multi.'''
+    if multi:
+        parser.add_argument(
+            '-F',
+            '--formats',
+            metavar='exts',
+            type=str,
+            default=None,
+            help='comma separated output formats of the crops (%s), default as the image'
+                 % ','.join(sorted(formats)))
+    parser.add_argument(
+        '-q',
+        '--quality',
+        metavar='quality',
+        type=int,
+        default=None,
+        help='jpeg quality 1-95, default 75')
+    parser.add_argument(
+        '--progressive',
+        action='store_true',
+        help='progressive jpeg')
+    parser.add_argument(
+        '--subsampling',
+        choices=sorted(subsamplings),
+        default=None,
+        help='jpeg chroma subsampling, default 4:2:0')
+    parser.add_argument(
+        '--png-level',
+        metavar='level',
+        type=int,
+        default=None,
+        help='png compress level 0-9, 1 is fast, default 6')
+    parser.add_argument(
+        '--optimize',
+        action='store_true',
+        help='smallest png and jpeg files, slower')
+    parser.add_argument(
+        '--tiff-compression',
+        choices=sorted(tiff_compressions),
+        default=None,
+        help='tiff compression, group4 for bilevel images (deflate for others), default none')
+    parser.add_argument(
+        '--webp-quality',
+        metavar='quality',
+        type=int,
+        default=None,
+        help='webp quality 0-100, default 80')
+    parser.add_argument(
+        '--webp-lossless',
+        action='store_true',
+        help='lossless webp')
+    parser.add_argument(
+        '-c',
+        '--classify',
+        action='store_true',
+        help='save black and white or gray crops as bilevel or gray images')
+    parser.add_argument(
+        '--deskew',
+        action='store_true',
+        help='straighten crops of clippings scanned askew')
+
+
+def encoder_settings(args):
+    '''Settings for save() from the parsed encoder arguments.'''
+    jpeg = {}
+    if args.quality is not None:
+        jpeg['quality'] = args.quality
+    if args.progressive:
+        jpeg['progressive'] = True
+    if args.subsampling:
+        jpeg['subsampling'] = subsamplings[args.subsampling]
+    png = {}
+    if args.png_level is not None:
+        png['compress_level'] = args.png_level
+    if args.optimize:
+        png['optimize'] = True
+        jpeg['optimize'] = True
+    tiff = {}
+    if args.tiff_compression:
+        tiff['compression'] = tiff_compressions[args.tiff_compression]
+    webp = {}
+    if args.webp_quality is not None:
+        webp['quality'] = args.webp_quality
+    if args.webp_lossless:
+        webp['lossless'] = True
+    return {'JPEG': jpeg, 'PNG': png, 'TIFF': tiff, 'WEBP': webp,
+            'classify': args.classify, 'deskew': args.deskew}
+
+
+def output_exts(args):
+    '''Extensions from --formats, None to keep that of the image.'''
+    if not getattr(args, 'formats', None):
+        return None
+    exts = [e.strip().lower().lstrip('.') for e in args.formats.split(',') if e.strip()]
+    for ext in exts:
+        if ext not in formats:
+            raise ValueError('unknown output format %s' % ext)
+    return exts
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+'''
+export.py - Saves crops in background threads while the GUI goes on.
+
+A job is a list of steps (callables without arguments, one per crop or
+page) submitted under the name of its source file. Steps run in
+submission order on one worker thread by default, so PDF pages stay in
+order. Progress counts steps; cancel() drops the queued jobs and stops the
+running one before its next step. A failing step is recorded with its
+file name and the job goes on.
+'''
+
+import threading
+from collections import deque
+
+
+class Exporter(object):
+    def __init__(self, workers=1):
+        self.jobs = deque()
+        self.errors = []
+        self.done = 0
+        self.total = 0
+        self.current = None
+        self._busy = 0
+        self._cancel = 0
+        self._cond = threading.Condition()
+        for i in range(workers):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+
+    def submit(self, name, steps):
+        steps = list(steps)
+        with self._cond:
+            self.jobs.append((name, steps, self._cancel))
+            self.total += len(steps)
+            self._cond.notify()
+
+    def cancel(self):
+        '''Drop the queued jobs and stop the running ones.'''
+        with self._cond:
+            self._cancel += 1
+            for name, steps, generation in self.jobs:
+                self.total -= len(steps)
+                self.errors.append((name, 'cancelled'))
+            self.jobs.clear()
+            self._cond.notify_all()
+
+    def busy(self):
+        with self._cond:
+            return bool(self.jobs) or self._busy > 0
+
+    def wait(self, timeout=None):
+        '''Block until every submitted job has finished; False on timeout.'''
+        with self._cond:
+            if timeout is None:
+                while self.jobs or self._busy:
+                    self._cond.wait()
+            elif self.jobs or self._busy:
+                self._cond.wait(timeout)
+            return not (self.jobs or self._busy)
+
+    def status(self):
+        '''A one line progress text, '' when idle.'''
+        with self._cond:
+            if not (self.jobs or self._busy):
+                return ''
+            return 'saving %d/%d %s' % (self.done + 1, self.total,
+                                        self.current or '')
+
+    def report(self, name, message):
+        '''Record an error of work done outside the exporter.'''
+        with self._cond:
+            self.errors.append((name, message))
+
+    def take_errors(self):
+        '''Errors since the last call, as (name, message) pairs.'''
+        with self._cond:
+            errors, self.errors = self.errors, []
+        return errors
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self.jobs:
+                    self._cond.wait()
+                name, steps, generation = self.jobs.popleft()
+                self._busy += 1
+                self.current = name
+            try:
+                for i, step in enumerate(steps):
+                    if self._cancel != generation:
+                        with self._cond:
+                            self.total -= len(steps) - i
+                            self.errors.append((name, 'cancelled'))
+                        break
+                    try:
+                        step()
+                    except Exception as e:
+                        with self._cond:
+                            self.errors.append((name, str(e)))
+                    with self._cond:
+                        self.done += 1
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    self.current = None
+                    if not (self.jobs or self._busy):
+                        self.done = self.total = 0
+                    self._cond.notify_all()
@@ -0,0 +1,722 @@
+# -*- coding: utf-8 -*-
+'''
+gui.py - The Tk crop window shared by croppertk.py and croppertktopdf.py.
+
+Application holds the canvas, zoom, autocrop, session and background
+export logic; the front ends subclass it, add their widgets to the work
+frame (work_widgets()) and change how the crop boxes of an image become
+export steps (crop_steps(), by default one cropped file per box). This is
+the only module of the package that imports Tk; PIL's ImageTk is imported
+with the first preview.
+'''
+
+import os
+import sys
+import functools
+
+from PIL import Image, ImageFilter
+
+from cropper.autocrop import autocrop_box, autocrop_boxes
+from cropper.encode import save_formats
+from cropper.export import Exporter
+from cropper.jpegcrop import snap_box
+from cropper.lru import LRUCache, image_bytes
+from cropper.overlay import Overlay
+from cropper.rect import Rect, thumboffset
+from cropper.regions import Regions
+from cropper.session import Session
+from cropper.sidecar import (file_hash, file_state, read_sidecar, scale_boxes,
+                             sidecar_current, write_sidecar)
+from cropper.source import ImageSource
+from cropper import timing
+
+if sys.version[0] == "2":
+    import Tkinter as tk
+else:
+    import tkinter as tk
+
+ImageTk = None
+
+thumbsize = 896, 608
+preview_cache_bytes = 64 * 1024 * 1024
+# canvas pixels around a selected box edge that grab the edge
+grab_size = 4
+export_poll_ms = 200
+default_tilecache = 256
+
+# scans of several gigapixels are expected, they are read through tiles
+Image.MAX_IMAGE_PIXELS = None
+
+
+def photoimage(image):
+    global ImageTk
+    if ImageTk is None:
+        from PIL import ImageTk
+    return ImageTk.PhotoImage(image)
+
+
+def askopenfilenames(master):
+    if sys.version[0] == "2":
+        import tkFileDialog as tkfd
+    else:
+        from tkinter import filedialog as tkfd
+    return tkfd.askopenfilenames(master=master,
+                  defaultextension='.jpg', multiple=1, parent=master,
+                  filetypes=(
+                      (('Image Files'),
+                       '.jpg .JPG .jpeg .JPEG .png .PNG .tif .TIF .tiff .TIFF'),
+                      (('JPEG Image Files'),
+                       '.jpg .JPG .jpeg .JPEG'),
+                      (('PNG Image Files'),
+                       '.png .PNG'),
+                      (('TIFF Image Files'),
+                       '.tif .TIF .tiff .TIFF'),
+                      (('All files'), '*'),
+                  ),
+                  title=('Select images to crop'))
+
+
+class Application(tk.Frame):
+    progname = 'Cropper'
+    # smaller rubber bands are taken for clicks
+    min_rect = 10
+
+    def __init__(self, master=None, filenames=None, tilecache=default_tilecache, settings=None):
+
+        tk.Frame.__init__(self, master)
+        self.grid()
+        self.settings = settings
+        self.createWidgets()
+        self.croprect_start = None
+        self.croprect_end = None
+        self.crop_rects = Regions()
+        self.region_rect = []
+        self.view_rect = None
+        self.image_item = None
+        self.photoimage = None
+        self.current_rect = None
+        self.motion_point = None
+        self.drag = None
+        self.size_text = None
+        self.zoommode = False
+        self.countour = False
+        self.acbwmode = False
+        self.acallmode = False
+        self.zooming = False
+        self.w = 1
+        self.h = 1
+        self.x0 = 0
+        self.y0 = 0
+        self.scale = None
+        self.n = 0
+        self.master.title(self.progname)
+
+        if not(filenames):
+            filenames = askopenfilenames(self)
+
+        self.tilecache = tilecache * 1024 * 1024
+        # crops are saved in the background, the Tk thread only polls
+        self.exporter = Exporter()
+        self.export_errors = []
+        # hashes of images touched since their sidecar was written
+        self.digests = {}
+        self.quitting = False
+        self.poll_export()
+        self.session = Session(filenames or [], self.prepare_image)
+        if filenames:
+            self.filename = self.session.filename
+            self.loadimage()
+
+    def createWidgets(self):
+        self.canvas = tk.Canvas(
+            self, height=1, width=1, relief=tk.SUNKEN)
+        self.canvas.bind('<Button-1>', self.canvas_mouse1_callback)
+        self.canvas.bind('<ButtonRelease-1>', self.canvas_mouseup1_callback)
+        self.canvas.bind('<B1-Motion>', self.canvas_mouseb1move_callback)
+        self.canvas.bind('<Delete>', self.delete_selected)
+        self.canvas.bind('<BackSpace>', self.delete_selected)
+        self.overlay = Overlay(self.canvas)
+
+        self.sizeLabel = tk.Label(self, text="0x0")
+
+        self.countourButton = tk.Checkbutton(self, text='X',
+                                              command=self.countour_mode)
+
+        self.workFrame = tk.LabelFrame(self)
+
+        self.zoomFrame = tk.LabelFrame(self.workFrame, text='Zooming')
+
+        self.zoomButton = tk.Checkbutton(self.zoomFrame, text='Zoom',
+                                              command=self.zoom_mode)
+
+        self.unzoomButton = tk.Button(self.zoomFrame, text='<-|->',
+                                           activebackground='#00F', command=self.unzoom_image)
+
+        self.zoomButton.grid(row=0, column=0)
+        self.unzoomButton.grid(row=0, column=1)
+
+        self.autoFrame = tk.LabelFrame(self.workFrame, text='AutoCrop')
+
+        self.autoButton = tk.Button(self.autoFrame, text='Auto', command=self.autocrop)
+
+        self.acbwButton = tk.Checkbutton(self.autoFrame, text='BW',
+                                              command=self.ac_bw_mode)
+
+        self.acallButton = tk.Checkbutton(self.autoFrame, text='All',
+                                              command=self.ac_all_mode)
+
+        self.autoButton.grid(row=0, column=0)
+        self.acbwButton.grid(row=0, column=1)
+        self.acallButton.grid(row=0, column=2)
+
+        self.plusButton = tk.Button(self.workFrame, text='+', command=self.plus_box)
+
+        self.mergeButton = tk.Button(self.workFrame, text='++', command=self.merge_boxes)
+
+        for column, widget in enumerate(self.work_widgets()):
+            widget.grid(row=0, column=column, padx=5)
+
+        self.ActionFrame = tk.LabelFrame(self, text='Action')
+
+        self.resetButton = tk.Button(self.ActionFrame, text='Reset',
+                                          activebackground='#F00', command=self.reset)
+
+        self.undoButton = tk.Button(self.ActionFrame, text='Undo',
+                                         activebackground='#FF0', command=self.undo_last)
+
+        self.delButton = tk.Button(self.ActionFrame, text='Del',
+                                        activebackground='#FF0', command=self.delete_selected)
+
+        self.goButton = tk.Button(self.ActionFrame, text='Crops',
+                                       activebackground='#0F0', command=self.start_cropping)
+
+        self.quitButton = tk.Button(self.ActionFrame, text='Quit',
+                                         activebackground='#F00', command=self.finish)
+
+        self.prevButton = tk.Button(self.ActionFrame, text='<',
+                                         command=self.prev_image)
+
+        self.nextButton = tk.Button(self.ActionFrame, text='>',
+                                         command=self.next_image)
+
+        self.prevButton.grid(row=0, column=0)
+        self.resetButton.grid(row=0, column=1)
+        self.undoButton.grid(row=0, column=2)
+        self.delButton.grid(row=0, column=3)
+        self.goButton.grid(row=0, column=4)
+        self.quitButton.grid(row=0, column=5)
+        self.nextButton.grid(row=0, column=6)
+
+        self.stopButton = tk.Button(self.ActionFrame, text='Stop',
+                                         activebackground='#F00', command=self.stop_export)
+        self.stopButton.grid(row=0, column=7)
+        self.exportLabel = tk.Label(self, text='')
+
+        self.canvas.grid(row=0, columnspan=3)
+        self.countourButton.grid(row=1, column=0)
+        self.workFrame.grid(row=1, column=1)
+        self.ActionFrame.grid(row=1, column=2)
+        self.sizeLabel.grid(row=2, column=0, columnspan=3)
+        self.exportLabel.grid(row=3, column=0, columnspan=3)
+
+    def set_button_state(self):
+        if self.n > 0:
+            self.plusButton.config(state = 'normal')
+            self.undoButton.config(state = 'normal')
+            self.goButton.config(state = 'normal')
+        else:
+            self.plusButton.config(state = 'disabled')
+            self.undoButton.config(state = 'disabled')
+            self.goButton.config(state = 'disabled')
+        if self.n > 1:
+            self.mergeButton.config(state = 'normal')
+        else:
+            self.mergeButton.config(state = 'disabled')
+        if self.overlay.selected is not None:
+            self.delButton.config(state = 'normal')
+        else:
+            self.delButton.config(state = 'disabled')
+        if self.zooming:
+            self.unzoomButton.config(state = 'normal')
+        else:
+            self.unzoomButton.config(state = 'disabled')
+        if self.session.has_prev():
+            self.prevButton.config(state = 'normal')
+        else:
+            self.prevButton.config(state = 'disabled')
+        if self.session.has_next():
+            self.nextButton.config(state = 'normal')
+        else:
+            self.nextButton.config(state = 'disabled')
+
+    def work_widgets(self):
+        # the children of the work frame, left to right
+        return [self.zoomFrame, self.autoFrame, self.plusButton, self.mergeButton]
+
+    def verify_params(self):
+        # read back the option boxes of the front end
+        pass
+
+    def image_point(self, x, y):
+        # canvas point to image point
+        return (int((x - thumboffset) * self.scale[0] + 0.5) + self.x0,
+                int((y - thumboffset) * self.scale[1] + 0.5) + self.y0)
+
+    def grab_tolerance(self):
+        return int(grab_size * max(self.scale) + 0.5)
+
+    def canvas_mouse1_callback(self, event):
+        self.croprect_start = (event.x, event.y)
+        self.canvas.focus_set()
+        self.drag = None
+        # pressing on the selected box moves it, near an edge resizes it;
+        # anywhere else a new box is drawn
+        index = self.overlay.selected
+        if index is None or self.zoommode:
+            return
+        x, y = self.image_point(event.x, event.y)
+        tol = self.grab_tolerance()
+        rect = self.crop_rects[index]
+        if (rect.left - tol <= x <= rect.right + tol and
+                rect.top - tol <= y <= rect.bottom + tol):
+            self.drag = (index, rect, self.grab_edges(rect, x, y, tol))
+
+    def grab_edges(self, rect, x, y, tol):
+        # (left, top, right, bottom) flags of the edges to move, None to
+        # move the whole box
+        left = abs(x - rect.left) <= tol
+        right = abs(x - rect.right) <= tol
+        if left and right:
+            left = x - rect.left < rect.right - x
+            right = not left
+        top = abs(y - rect.top) <= tol
+        bottom = abs(y - rect.bottom) <= tol
+        if top and bottom:
+            top = y - rect.top < rect.bottom - y
+            bottom = not top
+        if not (left or top or right or bottom):
+            return None
+        return left, top, right, bottom
+
+    def drag_rect(self, x, y):
+        # the dragged box with the mouse at canvas point (x, y)
+        index, rect, edges = self.drag
+        x1, y1 = self.image_point(*self.croprect_start)
+        x2, y2 = self.image_point(x, y)
+        dx = x2 - x1
+        dy = y2 - y1
+        if edges is None:
+            # keep the size, stay inside the image
+            dx = min(max(dx, -rect.left), self.w - rect.right)
+            dy = min(max(dy, -rect.top), self.h - rect.bottom)
+            return rect.move_rect(dx, dy)
+        left, top, right, bottom = rect.box()
+        if edges[0]:
+            left += dx
+        if edges[1]:
+            top += dy
+        if edges[2]:
+            right += dx
+        if edges[3]:
+            bottom += dy
+        return Rect((left, top), (right, bottom)).valid_rect(self.w, self.h)
+
+    def canvas_mouseb1move_callback(self, event):
+        # coalesce motion events: only the last point is drawn when idle
+        if self.motion_point is None:
+            self.after_idle(self.update_rubber_band)
+        self.motion_point = (event.x, event.y)
+
+    def update_rubber_band(self):
+        if self.motion_point is None:
+            return
+        x1 = self.croprect_start[0]
+        y1 = self.croprect_start[1]
+        x2, y2 = self.motion_point
+        self.motion_point = None
+        if self.drag is not None:
+            rect = self.drag_rect(x2, y2)
+            self.overlay.move(self.drag[0], rect.rescale_rect(self.scale, self.x0, self.y0))
+            dt = str(rect.w) + "x" + str(rect.h)
+        else:
+            bbox = (x1, y1, x2, y2)
+            if self.current_rect:
+                self.canvas.coords(self.current_rect, bbox)
+            else:
+                self.current_rect = self.canvas.create_rectangle(bbox)
+            dx = int((x2 - x1) * self.scale[0] * 10 + 0.5) * 0.1
+            dy = int((y2 - y1) * self.scale[1] * 10 + 0.5) * 0.1
+            dt = str(dx) + "x" + str(dy)
+        if dt != self.size_text:
+            self.size_text = dt
+            self.sizeLabel.configure(text=dt)
+
+    def canvas_mouseup1_callback(self, event):
+        self.motion_point = None
+        self.croprect_end = (event.x, event.y)
+        if self.drag is not None:
+            self.end_drag()
+            return
+        self.set_crop_area()
+        self.canvas.delete(self.current_rect)
+        self.current_rect = None
+
+    def end_drag(self):
+        index, rect = self.drag[:2]
+        newrect = self.drag_rect(*self.croprect_end)
+        self.drag = None
+        if min(newrect.w, newrect.h) < 1:
+            newrect = rect
+        newrect = Rect.from_box(self.snap(newrect.box()))
+        self.crop_rects[index] = newrect
+        self.overlay.move(index, newrect.rescale_rect(self.scale, self.x0, self.y0))
+        self.set_button_state()
+
+    def select_at(self, x, y):
+        # select the box under canvas point (x, y), or none
+        if self.scale is None:
+            return
+        x, y = self.image_point(x, y)
+        self.overlay.select(self.crop_rects.hit(x, y, self.grab_tolerance()))
+        self.set_button_state()
+
+    def set_crop_area(self):
+        r = Rect(self.croprect_start, self.croprect_end)
+
+        # adjust dimensions
+        r.clip_to(self.image_thumb_rect)
+
+        # ignore rects smaller than this size, a click selects a box
+        if min(r.h, r.w) < self.min_rect:
+            if not self.zoommode:
+                self.select_at(*self.croprect_end)
+            return
+
+        ra = r
+        ra = ra.scale_rect(self.scale)
+        ra = ra.move_rect(self.x0, self.y0)
+        ra = ra.valid_rect(self.w, self.h)
+        if self.zoommode:
+            self.x0 = ra.left
+            self.y0 = ra.top
+            self.region_rect = ra
+            self.displayimage()
+            self.zoommode = False
+            self.zoomButton.deselect()
+            self.zooming = True
+        else:
+            self.overlay.select(None)
+            ra = Rect.from_box(self.snap(ra.box()))
+            self.drawrect(ra.rescale_rect(self.scale, self.x0, self.y0))
+            self.crop_rects.append(ra)
+            self.n = self.n + 1
+        self.verify_params()
+        self.set_button_state()
+
+    def delete_selected(self, event=None):
+        index = self.overlay.selected
+        if index is None:
+            return
+        self.overlay.remove(index)
+        self.crop_rects.pop(index)
+        self.n = self.n - 1
+        self.set_button_state()
+
+    def merge_boxes(self):
+        # every group of overlapping boxes becomes one box
+        self.overlay.select(None)
+        if self.crop_rects.merge_overlapping():
+            self.n = len(self.crop_rects)
+            self.redraw_rect()
+        self.set_button_state()
+
+    def countour_mode(self):
+        if self.countour:
+            self.countour = False
+        else:
+            self.countour = True
+        self.displayimage()
+
+    def zoom_mode(self):
+        if self.zoommode:
+            self.zoommode = False
+        else:
+            self.zoommode = True
+
+    def unzoom_image(self):
+        self.zoommode = False
+        self.zoomButton.deselect()
+        self.x0 = 0
+        self.y0 = 0
+        self.region_rect = Rect((0, 0), (self.w, self.h))
+        self.zooming = False
+        self.displayimage()
+
+    def plus_box(self):
+        if self.n > 1:
+            if self.crop_rects:
+                self.overlay.pop()
+                self.n = self.n - 1
+                ra0 = self.crop_rects.union(self.n - 1, self.n)
+                self.overlay.move(self.n - 1,
+                                  ra0.rescale_rect(self.scale, self.x0, self.y0))
+                self.zoommode = False
+                self.zoomButton.deselect()
+        self.set_button_state()
+
+    def redraw_rect(self):
+        self.overlay.set_boxes(self.crop_rects.to_canvas(self.scale, self.x0, self.y0))
+
+    def undo_last(self):
+        if (self.n > 0):
+            self.overlay.pop()
+            if self.crop_rects:
+                self.crop_rects.pop()
+            self.n = self.n - 1
+        self.set_button_state()
+
+    def drawrect(self, rect):
+        self.overlay.add(rect)
+
+    @timing.timed('displayimage', timing.source_args)
+    def displayimage(self):
+        rr = (self.region_rect.left, self.region_rect.top, self.region_rect.right, self.region_rect.bottom)
+        self.image_thumb, photoimage = self.preview(rr, self.countour)
+
+        self.image_thumb_rect = Rect(self.image_thumb.size)
+
+        # upload the background only when it changes
+        if photoimage is not self.photoimage:
+            self.photoimage = photoimage
+            w, h = self.image_thumb.size
+            self.canvas.configure(
+                width=(w + 2 * thumboffset),
+                height=(h + 2 * thumboffset))
+
+            if self.image_item is None:
+                self.image_item = self.canvas.create_image(
+                    thumboffset,
+                    thumboffset,
+                    anchor=tk.NW,
+                    image=self.photoimage)
+                self.canvas.tag_lower(self.image_item)
+            else:
+                self.canvas.itemconfigure(self.image_item, image=self.photoimage)
+
+        # move the rectangles only when the visible region changes
+        view = (rr, self.image_thumb.size)
+        if view != self.view_rect:
+            self.view_rect = view
+            x_scale = float(self.region_rect.w) / self.image_thumb_rect.w
+            y_scale = float(self.region_rect.h) / self.image_thumb_rect.h
+            self.scale = (x_scale, y_scale)
+            self.redraw_rect()
+        self.set_button_state()
+
+    def preview(self, rr, countour):
+        key = (rr, thumbsize, countour)
+        cached = self.preview_cache.get(key)
+        if cached is None:
+            if countour:
+                image_thumb = self.preview(rr, False)[0].filter(ImageFilter.CONTOUR)
+            else:
+                image_thumb = self.source.thumbnail(rr, thumbsize)
+            cached = (image_thumb, photoimage(image_thumb))
+            self.preview_cache.put(key, cached)
+        return cached
+
+    def reset(self):
+        self.zoommode = False
+        self.zoomButton.deselect()
+        self.zooming = False
+        self.countour = False
+        self.countourButton.deselect()
+        self.acbwmode = False
+        self.acbwButton.deselect()
+        self.acallmode = False
+        self.acallButton.deselect()
+        self.overlay.clear()
+        self.crop_rects.clear()
+        self.region_rect = Rect((0, 0), (self.w, self.h))
+        self.n = 0
+        self.x0 = 0
+        self.y0 = 0
+
+        self.displayimage()
+        self.verify_params()
+
+    def ac_bw_mode(self):
+        if self.acbwmode:
+            self.acbwmode = False
+        else:
+            self.acbwmode = True
+
+    def ac_all_mode(self):
+        if self.acallmode:
+            self.acallmode = False
+        else:
+            self.acallmode = True
+
+    @timing.timed('autocrop', timing.source_args)
+    def autocrop(self):
+        rr = (self.region_rect.left, self.region_rect.top, self.region_rect.right, self.region_rect.bottom)
+        if self.acallmode:
+            boxes = autocrop_boxes(self.image, rr, self.acbwmode,
+                                   pyramid=self.source.pyramid)
+        else:
+            bbox = autocrop_box(self.image, self.acbwmode, rr)
+            if not bbox:
+                return
+            boxes = [(self.x0 + bbox[0], self.y0 + bbox[1], self.x0 + bbox[2], self.y0 + bbox[3])]
+        start = self.crop_rects.add_boxes([self.snap(b) for b in boxes], self.w, self.h)
+        self.n = len(self.crop_rects)
+        for bbox in self.crop_rects.to_canvas(self.scale, self.x0, self.y0, start):
+            self.overlay.add_box(bbox)
+        self.set_button_state()
+
+    def prepare_image(self, filename):
+        # runs in the session prefetch thread: no Tk calls here
+        source = ImageSource(filename, thumbsize, self.tilecache)
+        data = read_sidecar(filename)
+        if data and data.get('state') != file_state(filename):
+            # hash here: a large scan would stall the window
+            self.digests[filename] = file_hash(filename)
+        return source
+
+    @timing.timed('loadimage', timing.source_args)
+    def loadimage(self):
+        self.source = self.session.get()
+        print (self.source.size)
+        # thumbnail and its PhotoImage, counted twice for the Tk copy
+        self.preview_cache = LRUCache(preview_cache_bytes,
+                                      lambda v: 2 * image_bytes(v[0]))
+        self.master.title('%s - %s [%d/%d]' % (self.progname,
+                          os.path.basename(self.filename),
+                          self.session.index + 1, len(self.session)))
+        self.image_rect = Rect(self.source.size)
+        self.w = self.image_rect.w
+        self.h = self.image_rect.h
+        self.region_rect = Rect((0, 0), (self.w, self.h))
+        self.box_grid = self.crop_grid()
+        self.load_sidecar()
+        self.view_rect = None
+
+        self.displayimage()
+        self.verify_params()
+
+    @property
+    def image(self):
+        return self.source.image
+
+    def load_sidecar(self):
+        # boxes saved by an earlier session, scaled if the image was rescanned
+        data = read_sidecar(self.filename)
+        if not data:
+            return
+        # hashed in the prefetch thread, or now if touched since
+        digest = self.digests.get(self.filename)
+        if not sidecar_current(self.filename, data, digest):
+            print ('%s: changed since the boxes were saved' % self.filename)
+            return
+        boxes = scale_boxes(data['rects'], data['size'], self.source.size)
+        self.crop_rects.add_boxes([self.snap(b) for b in boxes], self.w, self.h)
+        self.n = len(self.crop_rects)
+
+    def sidecar_step(self):
+        # hashing the image is the slow part: done with the crops
+        return functools.partial(write_sidecar, self.filename, self.source.size,
+                                 self.crop_rects.boxes())
+
+    def crop_grid(self):
+        # (w, h) of the grid the boxes of this image start on, None to
+        # keep them as drawn
+        return None
+
+    def snap(self, box):
+        if self.box_grid is None:
+            return box
+        return snap_box(box, self.box_grid)
+
+    def newfilename(self, filenum, ext=None):
+        f, e = os.path.splitext(self.filename)
+        if ext:
+            e = '.' + ext
+        return '%s__crop__%s%s' % (f, filenum, e)
+
+    @timing.timed('start_cropping', timing.source_args)
+    def start_cropping(self):
+        self.verify_params()
+        self.exporter.submit(os.path.basename(self.filename),
+                             self.crop_steps() + [self.sidecar_step()])
+        if self.session.has_next():
+            self.next_image()
+        else:
+            self.finish()
+
+    def crop_steps(self):
+        # export steps for the crop boxes of the current image, they run
+        # in the export thread: no Tk calls in them
+        image = self.image
+        steps = []
+        for cropcount, croparea in enumerate(self.crop_rects, 1):
+            names = self.crop_names(cropcount)
+            print (' '.join(names), croparea)
+            steps.append(functools.partial(self.crop, croparea, names, image))
+        return steps
+
+    def crop_names(self, filenum):
+        return [self.newfilename(filenum)]
+
+    def crop(self, croparea, filenames, image):
+        # runs in the export thread: no Tk calls here
+        ca = (croparea.left, croparea.top, croparea.right, croparea.bottom)
+        with timing.span('crop', **timing.image_args(image)):
+            newimg = image.crop(ca)
+        # one crop, encoded to every format in parallel
+        save_formats(newimg, filenames, self.settings)
+
+    def finish(self):
+        self.quitting = True
+
+    def poll_export(self):
+        for name, message in self.exporter.take_errors():
+            print ('%s: %s' % (name, message))
+            self.export_errors.append((name, message))
+        text = self.exporter.status()
+        if self.quitting and text:
+            text += ' (quit when done)'
+        if self.export_errors:
+            text += ' errors: %d, last %s: %s' % ((len(self.export_errors),) +
+                                                 self.export_errors[-1])
+        self.exportLabel.config(text = text)
+        if self.exporter.busy():
+            self.stopButton.config(state = 'normal')
+        else:
+            self.stopButton.config(state = 'disabled')
+            if self.quitting:
+                self.quit()
+                return
+        self.after(export_poll_ms, self.poll_export)
+
+    def stop_export(self):
+        self.exporter.cancel()
+
+    def goto_image(self, step):
+        if not self.session.move(step):
+            return
+        self.filename = self.session.filename
+        self.zoommode = False
+        self.zoomButton.deselect()
+        self.zooming = False
+        self.overlay.clear()
+        self.crop_rects.clear()
+        self.n = 0
+        self.x0 = 0
+        self.y0 = 0
+        self.loadimage()
+
+    def next_image(self):
+        self.goto_image(1)
+
+    def prev_image(self):
+        self.goto_image(-1)
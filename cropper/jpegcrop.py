@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+'''
+jpegcrop.py - Lossless cropping of JPEG files with jpegtran.
+
+jpegtran (libjpeg / libjpeg-turbo) copies the DCT coefficients of the
+blocks inside the crop, so nothing is decoded or re-encoded. Its crop
+origin must lie on the MCU grid (8 or 16 pixels depending on the chroma
+subsampling), the right and bottom edges can be anywhere. With lossless
+crops on, the GUI and the batch mode snap the boxes outward to the grid
+of the image (crop_grid(), snap_box()), so the box shown is the box cut.
+lossless_crop() itself never moves a box: it returns None when the crop
+cannot be done exactly this way (no jpegtran, not a JPEG, another output
+format, a box off the grid or past the image, jpegtran failed) and the
+caller re-encodes as before.
+'''
+
+import os
+import subprocess
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+jpeg_exts = ('.jpg', '.jpeg', '.jpe')
+
+jpegtran = which('jpegtran')
+
+
+def mcu_size(image):
+    '''(width, height) of the MCU of an opened JPEG, None if unknown.'''
+    layers = getattr(image, 'layer', None)
+    if not layers:
+        return None
+    if len(layers) == 1:
+        # a single component is not interleaved: 8x8 blocks
+        return 8, 8
+    return (8 * max(layer[1] for layer in layers),
+            8 * max(layer[2] for layer in layers))
+
+
+def snap_box(box, mcu):
+    '''box with its left and top moved out to the MCU grid, the right
+    and bottom edges are kept.'''
+    left, top, right, bottom = box
+    return (left - left % mcu[0], top - top % mcu[1], right, bottom)
+
+
+def on_grid(box, mcu):
+    '''Whether jpegtran can cut box exactly: its left and top are on the
+    MCU grid.'''
+    return box[0] % mcu[0] == 0 and box[1] % mcu[1] == 0
+
+
+def can_crop(image, outfile):
+    return (jpegtran is not None and
+            getattr(image, 'format', None) == 'JPEG' and
+            bool(getattr(image, 'filename', None)) and
+            os.path.splitext(outfile)[1].lower() in jpeg_exts and
+            mcu_size(image) is not None)
+
+
+def crop_grid(image, outfiles):
+    '''The MCU size of the opened JPEG image if lossless_crop() can cut
+    it into one of outfiles, else None.'''
+    for outfile in outfiles:
+        if can_crop(image, outfile):
+            return mcu_size(image)
+    return None
+
+
+def lossless_crop(image, box, outfile):
+    '''Cut box from the file of the opened JPEG image into outfile without
+    re-encoding. Returns the box, None if not done.'''
+    if not can_crop(image, outfile) or not on_grid(box, mcu_size(image)):
+        return None
+    left, top, right, bottom = [int(v) for v in box]
+    w, h = image.size
+    if not (0 <= left < right <= w and 0 <= top < bottom <= h):
+        return None
+    args = [jpegtran, '-copy', 'all',
+            '-crop', '%dx%d+%d+%d' % (right - left, bottom - top, left, top),
+            '-outfile', outfile, image.filename]
+    try:
+        with open(os.devnull, 'w') as devnull:
+            code = subprocess.call(args, stderr=devnull)
+    except OSError:
+        return None
+    if code != 0:
+        return None
+    return (left, top, right, bottom)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+'''
+lazy.py - Optional modules imported on first use.
+
+NumPy takes longer to import than the rest of the package; the modules
+that can do without it ask for it here when they need it, so callers
+that never autocrop do not pay for it.
+'''
+
+import importlib
+
+_modules = {}
+
+
+def optional(name):
+    '''The module name, imported on the first call; None if missing.'''
+    if name not in _modules:
+        try:
+            _modules[name] = importlib.import_module(name)
+        except ImportError:
+            _modules[name] = None
+    return _modules[name]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+'''
+lru.py - A least recently used cache limited by the total size of its
+values.
+'''
+
+import threading
+from collections import OrderedDict
+
+
+def image_bytes(image):
+    w, h = image.size
+    return w * h * len(image.getbands())
+
+
+class LRUCache(object):
+    def __init__(self, maxbytes, sizeof=None):
+        '''sizeof(value) gives the cost of a value, default 1 per entry.'''
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof or (lambda value: 1)
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, size = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = (value, size)
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self.nbytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.maxbytes and len(self._items) > 1:
+                self.nbytes -= self._items.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
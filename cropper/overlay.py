@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+'''
+overlay.py - Keeps one canvas item per crop rectangle.
+
+Items are moved with coords() when the view changes and are added or
+removed one at a time, so editing a single rectangle does not repaint the
+canvas. One item can be selected, it is drawn with select_options.
+'''
+
+rect_options = {'activefill': '', 'fill': 'red', 'stipple': 'gray25'}
+select_options = {'fill': 'blue'}
+
+
+class Overlay(object):
+    def __init__(self, canvas, **options):
+        self.canvas = canvas
+        self.options = options or rect_options
+        self.items = []
+        self.selected = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, rect):
+        '''Draw rect (canvas coordinates) as a new item.'''
+        return self.add_box((rect.left, rect.top, rect.right, rect.bottom))
+
+    def add_box(self, bbox):
+        item = self.canvas.create_rectangle(bbox, **self.options)
+        self.items.append(item)
+        return item
+
+    def move(self, index, rect):
+        self.move_box(index, (rect.left, rect.top, rect.right, rect.bottom))
+
+    def move_box(self, index, bbox):
+        self.canvas.coords(self.items[index], bbox)
+
+    def remove(self, index):
+        if self.selected == index:
+            self.selected = None
+        elif self.selected is not None and self.selected > index:
+            self.selected -= 1
+        self.canvas.delete(self.items.pop(index))
+
+    def select(self, index):
+        '''Draw item index as selected, and no other; None selects none.'''
+        if self.selected is not None:
+            self.canvas.itemconfigure(self.items[self.selected],
+                                      **dict((k, self.options.get(k, ''))
+                                             for k in select_options))
+        self.selected = index
+        if index is not None:
+            self.canvas.itemconfigure(self.items[index], **select_options)
+
+    def pop(self):
+        if self.items:
+            self.remove(len(self.items) - 1)
+
+    def set_boxes(self, boxes):
+        '''Show exactly boxes (canvas coordinates), reusing the existing items.'''
+        for index, bbox in enumerate(boxes):
+            if index < len(self.items):
+                self.move_box(index, bbox)
+            else:
+                self.add_box(bbox)
+        while len(self.items) > len(boxes):
+            self.pop()
+
+    def clear(self):
+        while self.items:
+            self.pop()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+'''
+pdf.py - Places crops of a page image on a reportlab canvas.
+
+Crops are cut, shrunk and encoded in a thread pool and handed to the
+canvas from memory, so nothing has to be written and read back. JPEG
+crops are embedded as they were encoded; other crops are passed as
+images and compressed by reportlab.
+
+Given a forms dict, identical crops are embedded once per document as a
+form XObject and referenced from every page that shows them.
+
+With classification on (encode.py), gray crops are embedded as 8 bit gray
+and bilevel crops as 1 bit CCITT Group 4 images, which reportlab cannot
+write itself: CCITTImage and draw_ccitt() do what drawImage() does for
+them.
+
+With deskew set, each crop is straightened (deskew.py) but keeps the size
+of its box, so that it still fills its place on the page.
+'''
+
+import io
+import hashlib
+from multiprocessing.pool import ThreadPool
+
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfdoc
+
+from cropper.deskew import AngleCache, straighten
+from cropper.encode import prepare, save, save_options
+from cropper.pyramid import ANTIALIAS
+from cropper.timing import image_args, span
+
+jpeg_exts = ('jpg', 'jpeg')
+invert_table = [255 if v < 128 else 0 for v in range(256)]
+
+
+def points(pixels, dpi):
+    return round(pixels * 72.0 / dpi, 3)
+
+
+class CCITTImage(object):
+    '''A '1' image as the Group 4 data of a PDF image.'''
+
+    def __init__(self, image):
+        w, h = self.size = image.size
+        # libtiff codes 0 bits as white runs: invert so that black pixels
+        # are black runs for the PDF decoder, and write a single strip
+        inverted = image.convert('L').point(invert_table, '1')
+        buf = io.BytesIO()
+        inverted.save(buf, 'TIFF', compression='group4', tiffinfo={278: h})
+        tiff = Image.open(buf)
+        offset = tiff.tag_v2[273][0]
+        count = tiff.tag_v2[279][0]
+        self.data = buf.getvalue()[offset:offset + count]
+
+
+class CCITTXObject(pdfdoc.PDFImageXObject):
+    def __init__(self, name, ccitt):
+        pdfdoc.PDFImageXObject.__init__(self, name)
+        self.width, self.height = ccitt.size
+        self.streamContent = ccitt.data
+
+    def format(self, document):
+        S = pdfdoc.PDFStream(content=self.streamContent)
+        S.dictionary['Type'] = pdfdoc.PDFName('XObject')
+        S.dictionary['Subtype'] = pdfdoc.PDFName('Image')
+        S.dictionary['Width'] = self.width
+        S.dictionary['Height'] = self.height
+        S.dictionary['BitsPerComponent'] = 1
+        S.dictionary['ColorSpace'] = pdfdoc.PDFName('DeviceGray')
+        S.dictionary['Filter'] = pdfdoc.PDFName('CCITTFaxDecode')
+        S.dictionary['DecodeParms'] = pdfdoc.PDFDictionary(
+            {'K': -1, 'Columns': self.width, 'Rows': self.height})
+        S.dictionary['Length'] = len(self.streamContent)
+        return S.format(document)
+
+
+def draw_ccitt(pdf, ccitt, x, y, width, height):
+    '''Canvas.drawImage() for a CCITTImage.'''
+    name = 'G4' + hashlib.sha1(ccitt.data).hexdigest()
+    doc = pdf._doc
+    regName = doc.getXObjectName(name)
+    if doc.idToObject.get(regName) is None:
+        obj = CCITTXObject(name, ccitt)
+        pdf._setXObjects(obj)
+        doc.Reference(obj, regName)
+        doc.addForm(name, obj)
+    pdf.saveState()
+    pdf.translate(x, y)
+    pdf.scale(width, height)
+    pdf._code.append('/%s Do' % regName)
+    pdf.restoreState()
+    pdf._formsinuse.append(name)
+
+
+def draw_image(pdf, reader, x, y, width, height):
+    if isinstance(reader, CCITTImage):
+        draw_ccitt(pdf, reader, x, y, width, height)
+    else:
+        pdf.drawImage(reader, x, y, width=width, height=height)
+
+
+def _render(image, box, div, ext, filename, settings=None, cache=None):
+    '''Cut box from image, shrink it by div and save it to filename if
+    given, with the encoder settings. Returns an image for draw_image()
+    and a digest of the crop.'''
+    with span('crop', **image_args(image)):
+        if settings and settings.get('deskew'):
+            newimg = straighten(image, box, cache, trim=False)
+        else:
+            newimg = image.crop(box)
+        if div > 1:
+            divd = int(div / 2)
+            divw = int((box[2] - box[0] + divd) / div)
+            divh = int((box[3] - box[1] + divd) / div)
+            newimg.thumbnail((divw, divh), ANTIALIAS)
+    newimg = prepare(newimg, settings)
+    settings = dict(settings or {}, classified=True)
+    if ext in jpeg_exts and newimg.mode != '1':
+        with span('encode', format=ext, **image_args(newimg)):
+            buf = io.BytesIO()
+            newimg, options = save_options(newimg, 'JPEG', settings)
+            newimg.save(buf, 'JPEG', **options)
+            if filename:
+                with open(filename, 'wb') as f:
+                    f.write(buf.getvalue())
+        buf.seek(0)
+        return ImageReader(buf), hashlib.sha1(buf.getvalue()).hexdigest()
+    if filename:
+        save(newimg, filename, settings)
+    if newimg.mode == '1':
+        with span('encode', format='G4', **image_args(newimg)):
+            ccitt = CCITTImage(newimg)
+        return ccitt, hashlib.sha1(ccitt.data).hexdigest()
+    key = hashlib.sha1(newimg.tobytes())
+    key.update(('%s%r' % (newimg.mode, newimg.size)).encode('ascii'))
+    return ImageReader(newimg), key.hexdigest()
+
+
+def place_image(pdf, reader, x, y, width, height, forms=None, key=None):
+    '''drawImage(), or a form XObject shared by all crops with this key.'''
+    if forms is None:
+        with span('drawImage'):
+            draw_image(pdf, reader, x, y, width, height)
+        return
+    name = forms.get(key)
+    if name is None:
+        name = 'crop%d' % len(forms)
+        with span('drawImage'):
+            pdf.beginForm(name, 0, 0, 1, 1)
+            draw_image(pdf, reader, 0, 0, 1, 1)
+            pdf.endForm()
+        forms[key] = name
+    pdf.saveState()
+    pdf.translate(x, y)
+    pdf.scale(width, height)
+    pdf.doForm(name)
+    pdf.restoreState()
+
+
+def draw_crops(pdf, image, boxes, dpi, div=1, ext='png', filenames=None,
+               processes=None, forms=None, settings=None):
+    '''Draw every box of image on the current page of pdf, whose height
+    is that of image at dpi. Crops are prepared in parallel and drawn in
+    order as they become ready.'''
+    height = points(image.size[1], dpi)
+    filenames = filenames or [None] * len(boxes)
+    cache = None
+    if settings and settings.get('deskew'):
+        cache = AngleCache.for_image(image)
+
+    def job(args):
+        box, filename = args
+        return _render(image, box, div, ext, filename, settings, cache)
+
+    pool = ThreadPool(processes)
+    try:
+        crops = pool.imap(job, zip(boxes, filenames))
+        for box, (reader, key) in zip(boxes, crops):
+            place_image(pdf, reader, points(box[0], dpi),
+                        height - points(box[3], dpi),
+                        points(box[2] - box[0], dpi),
+                        points(box[3] - box[1], dpi), forms, key)
+    finally:
+        pool.close()
+        pool.join()
+    if cache:
+        cache.save()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+'''
+pyramid.py - Power-of-two downsamples of an image for fast previews.
+
+The levels are built once; a preview of any region is then resampled from
+the smallest level that still has at least as many pixels as the preview,
+so its cost depends on the preview size and not on the source size.
+'''
+
+from PIL import Image
+
+try:
+    ANTIALIAS = Image.LANCZOS
+except AttributeError:
+    ANTIALIAS = Image.ANTIALIAS
+
+
+def fit_size(w, h, size):
+    '''Size of (w, h) shrunk to fit in size, keeping the aspect ratio.'''
+    scale = min(float(size[0]) / w, float(size[1]) / h, 1.0)
+    return (max(int(w * scale + 0.5), 1), max(int(h * scale + 0.5), 1))
+
+
+def half(image):
+    if image.mode in ('1', 'P'):
+        # resize() falls back to NEAREST for these modes
+        image = image.convert('L' if image.mode == '1' else 'RGB')
+    w, h = image.size
+    if hasattr(image, 'reduce'):
+        return image.reduce(2)
+    return image.resize((max(w // 2, 1), max(h // 2, 1)), ANTIALIAS)
+
+
+class Pyramid(object):
+    def __init__(self, image, size, factor=1):
+        '''Build levels of image down to the first that fits in size.
+
+        factor is how many source pixels one pixel of image stands for,
+        e.g. 4 for a JPEG decoded in 1/4 draft mode.'''
+        self.size = size
+        w, h = image.size
+        self.fullsize = (int(w * factor + 0.5), int(h * factor + 0.5))
+        self.levels = self._build(image, factor, None)
+
+    def _build(self, image, factor, stop):
+        levels = [(image, factor)]
+        w, h = self.fullsize
+        tw, th = fit_size(w, h, self.size)
+        factor *= 2
+        while (w // factor >= tw and h // factor >= th and
+               (stop is None or factor < stop)):
+            image = half(image)
+            levels.append((image, factor))
+            factor *= 2
+        return levels
+
+    def set_base(self, image):
+        '''Add the full resolution image and the levels down to the
+        current finest level.'''
+        self.levels = self._build(image, 1, self.levels[0][1]) + self.levels
+
+    def level_for(self, box, size):
+        '''Return (level image, factor) to resample box to fit in size.
+
+        The factor may be too coarse if the full resolution image has not
+        been added yet; use has_level() to check.'''
+        w = box[2] - box[0]
+        h = box[3] - box[1]
+        tw, th = fit_size(w, h, size)
+        levels = self.levels
+        for level, factor in reversed(levels):
+            if w // factor >= tw and h // factor >= th:
+                return level, factor
+        return levels[0]
+
+    def has_level(self, box, size):
+        '''True if a level has enough pixels to resample box to size.'''
+        level, factor = self.level_for(box, size)
+        tw, th = fit_size(box[2] - box[0], box[3] - box[1], size)
+        return (box[2] - box[0]) // factor >= tw and (box[3] - box[1]) // factor >= th
+
+    def thumbnail(self, box, size):
+        '''Return the region box of the source resampled to fit in size.'''
+        w = box[2] - box[0]
+        h = box[3] - box[1]
+        level, factor = self.level_for(box, size)
+        tw, th = fit_size(w, h, size)
+        if factor == 1 and (tw, th) == (w, h):
+            return level.crop(box)
+        lbox = tuple(float(v) / factor for v in box)
+        if level.mode in ('1', 'P'):
+            level = level.crop(box).convert('L' if level.mode == '1' else 'RGB')
+            lbox = (0, 0, w, h)
+        return level.resize((tw, th), ANTIALIAS, box=lbox)
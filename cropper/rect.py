@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+'''
+rect.py - Crop rectangles in image and in canvas coordinates.
+
+Canvas rectangles are offset by thumboffset, the border around the
+preview; scale_rect() and rescale_rect() convert between the two. The
+boxes of an image are kept in a Regions array (regions.py), a Rect is
+made when one box is worked on.
+'''
+
+thumboffset = 16
+
+
+def _make(left, top, right, bottom):
+    # a new Rect without the argument parsing of set_points()
+    r = Rect.__new__(Rect)
+    r.left = left
+    r.top = top
+    r.right = right
+    r.bottom = bottom
+    r.w = right - left
+    r.h = bottom - top
+    return r
+
+
+class Rect(object):
+    __slots__ = ('left', 'top', 'right', 'bottom', 'w', 'h')
+
+    def __init__(self, *args):
+        self.set_points(*args)
+
+    @classmethod
+    def from_box(cls, box):
+        '''Rect of a (left, top, right, bottom) box, taken as is.'''
+        left, top, right, bottom = box
+        return _make(left, top, right, bottom)
+
+    def set_points(self, *args):
+        if len(args) == 2:
+            pt1 = args[0]
+            pt2 = args[1]
+        elif len(args) == 1:
+            pt1 = (0, 0)
+            pt2 = args[0]
+        elif len(args) == 0:
+            pt1 = (0, 0)
+            pt2 = (0, 0)
+
+        x1, y1 = pt1
+        x2, y2 = pt2
+
+        self.left = min(x1, x2)
+        self.top = min(y1, y2)
+        self.right = max(x1, x2)
+        self.bottom = max(y1, y2)
+
+        self._update_dims()
+
+    def box(self):
+        return (self.left, self.top, self.right, self.bottom)
+
+    def clip_to(self, containing_rect):
+        cr = containing_rect
+        self.top = max(self.top, cr.top + thumboffset)
+        self.bottom = min(self.bottom, cr.bottom + thumboffset)
+        self.left = max(self.left, cr.left + thumboffset)
+        self.right = min(self.right, cr.right + thumboffset)
+        self._update_dims()
+
+    def _update_dims(self):
+        """added to provide w and h dimensions."""
+
+        self.w = self.right - self.left
+        self.h = self.bottom - self.top
+
+    def scale_rect(self, scale):
+        x_scale = scale[0]
+        y_scale = scale[1]
+
+        return _make(int((self.left - thumboffset) * x_scale + 0.5),
+                     int((self.top - thumboffset) * y_scale + 0.5),
+                     int((self.right - thumboffset) * x_scale + 0.5),
+                     int((self.bottom - thumboffset) * y_scale + 0.5))
+
+    def move_rect(self, x0, y0):
+        return _make(int(self.left + x0), int(self.top + y0),
+                     int(self.right + x0), int(self.bottom + y0))
+
+    def rescale_rect(self, scale, x0, y0):
+        x_scale = scale[0]
+        y_scale = scale[1]
+
+        return _make(int((self.left - x0) / x_scale + thumboffset),
+                     int((self.top - y0) / y_scale + thumboffset),
+                     int((self.right - x0) / x_scale + thumboffset),
+                     int((self.bottom - y0) / y_scale + thumboffset))
+
+    def plus_rect(self, r0):
+        return _make(min(self.left, r0.left), min(self.top, r0.top),
+                     max(self.right, r0.right), max(self.bottom, r0.bottom))
+
+    def valid_rect(self, w, h):
+        return _make(min(max(self.left, 0), w - 1),
+                     min(max(self.top, 0), h - 1),
+                     min(max(self.right, 1), w),
+                     min(max(self.bottom, 1), h))
+
+    def addmargin_rect(self, margin, width, height):
+        return _make(self.left - margin, self.top - margin,
+                     self.right + margin, self.bottom + margin).valid_rect(width, height)
+
+    def __repr__(self):
+        return '(%d,%d)-(%d,%d)' % (self.left,
+                                    self.top, self.right, self.bottom)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+'''
+regions.py - The crop boxes of an image in one int32 array.
+
+Regions keeps N boxes (left, top, right, bottom) in image pixels in a
+contiguous array('i'), four ints per box, instead of N Rect objects. The
+transforms between image and canvas coordinates, clipping to the image
+and unions run over the whole array: through a NumPy view from
+vector_min boxes on, in a plain loop below that (and without NumPy),
+with the same rounding as the Rect methods. Indexing returns a Rect.
+
+Hit tests go through a GridIndex (spatial.py), built on the first one
+and kept up to date by append(), item assignment and popping the last
+box; other edits drop it to be rebuilt when next asked.
+merge_overlapping() finds overlaps through a GridIndex of its own.
+'''
+
+from array import array
+
+from cropper.lazy import optional
+from cropper.rect import Rect, thumboffset
+from cropper.spatial import GridIndex, cell_size, overlaps, union
+
+# fewer boxes are faster in a loop than through NumPy
+vector_min = 32
+
+
+def _box(rect):
+    if isinstance(rect, Rect):
+        return rect.box()
+    return tuple(rect)
+
+
+class Regions(object):
+    def __init__(self, rects=()):
+        self.data = array('i')
+        self._grid = None
+        self.extend(rects)
+
+    def __len__(self):
+        return len(self.data) // 4
+
+    def __bool__(self):
+        return len(self.data) > 0
+
+    __nonzero__ = __bool__
+
+    def _index(self, index):
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('region index out of range')
+        return index
+
+    def __getitem__(self, index):
+        i = 4 * self._index(index)
+        return Rect.from_box(self.data[i:i + 4])
+
+    def __setitem__(self, index, rect):
+        index = self._index(index)
+        i = 4 * index
+        box = _box(rect)
+        if self._grid is not None:
+            self._grid.remove(index, self._box_at(index))
+            self._grid.insert(index, box)
+        self.data[i:i + 4] = array('i', box)
+
+    def _box_at(self, index):
+        i = 4 * index
+        return tuple(self.data[i:i + 4])
+
+    def __iter__(self):
+        data = self.data
+        for i in range(0, len(data), 4):
+            yield Rect.from_box(data[i:i + 4])
+
+    def append(self, rect):
+        box = _box(rect)
+        if self._grid is not None:
+            self._grid.insert(len(self), box)
+        self.data.extend(box)
+
+    def extend(self, rects):
+        for rect in rects:
+            self.append(rect)
+
+    def pop(self, index=-1):
+        index = self._index(index)
+        rect = self[index]
+        if self._grid is not None:
+            if index == len(self) - 1:
+                self._grid.remove(index, rect.box())
+            else:
+                # the boxes after it are renumbered
+                self._grid = None
+        i = 4 * index
+        del self.data[i:i + 4]
+        return rect
+
+    def clear(self):
+        del self.data[:]
+        self._grid = None
+
+    def boxes(self):
+        '''All boxes as (left, top, right, bottom) tuples.'''
+        data = self.data
+        return [tuple(data[i:i + 4]) for i in range(0, len(data), 4)]
+
+    def _view(self):
+        # an N x 4 NumPy view of data, None to use the loops; the view
+        # must not outlive the call, data cannot grow while it exists
+        if len(self) < vector_min:
+            return None
+        numpy = optional('numpy')
+        if numpy is None:
+            return None
+        return numpy.frombuffer(self.data, dtype=numpy.intc).reshape(-1, 4)
+
+    def to_canvas(self, scale, x0, y0, start=0):
+        '''Boxes from start on in canvas coordinates of a view scaled by
+        scale from the image point (x0, y0), as Rect.rescale_rect().'''
+        x_scale, y_scale = scale
+        a = self._view()
+        if a is not None:
+            numpy = optional('numpy')
+            b = numpy.empty((len(a) - start, 4), dtype=numpy.float64)
+            b[:, 0::2] = (a[start:, 0::2] - x0) / float(x_scale)
+            b[:, 1::2] = (a[start:, 1::2] - y0) / float(y_scale)
+            b += thumboffset
+            return [tuple(box) for box in b.astype(numpy.intc).tolist()]
+        data = self.data
+        return [(int((data[i] - x0) / x_scale + thumboffset),
+                 int((data[i + 1] - y0) / y_scale + thumboffset),
+                 int((data[i + 2] - x0) / x_scale + thumboffset),
+                 int((data[i + 3] - y0) / y_scale + thumboffset))
+                for i in range(4 * start, len(data), 4)]
+
+    def clip(self, w, h, start=0):
+        '''Clip the boxes from start on to a w x h image, as
+        Rect.valid_rect().'''
+        self._grid = None
+        a = self._view()
+        if a is not None:
+            a = a[start:]
+            a[:, 0].clip(0, w - 1, out=a[:, 0])
+            a[:, 1].clip(0, h - 1, out=a[:, 1])
+            a[:, 2].clip(1, w, out=a[:, 2])
+            a[:, 3].clip(1, h, out=a[:, 3])
+            return
+        data = self.data
+        for i in range(4 * start, len(data), 4):
+            data[i] = min(max(data[i], 0), w - 1)
+            data[i + 1] = min(max(data[i + 1], 0), h - 1)
+            data[i + 2] = min(max(data[i + 2], 1), w)
+            data[i + 3] = min(max(data[i + 3], 1), h)
+
+    def add_boxes(self, boxes, w, h):
+        '''Append image boxes clipped to a w x h image, return the index
+        of the first one.'''
+        start = len(self)
+        self.extend(boxes)
+        self.clip(w, h, start)
+        return start
+
+    def union(self, index, other):
+        '''Grow box index to also cover box other and remove other.'''
+        merged = self[index].plus_rect(self[other])
+        self[index] = merged
+        self.pop(other)
+        return merged
+
+    def grid(self):
+        if self._grid is None:
+            self._grid = GridIndex(self.boxes())
+        return self._grid
+
+    def hit(self, x, y, tol=0):
+        '''Index of the topmost (last added) box within tol pixels of the
+        point (x, y), None if there is none.'''
+        data = self.data
+        best = None
+        for index in self.grid().near((x - tol, y - tol, x + tol + 1, y + tol + 1)):
+            i = 4 * index
+            if (data[i] - tol <= x <= data[i + 2] + tol and
+                    data[i + 1] - tol <= y <= data[i + 3] + tol and
+                    (best is None or index > best)):
+                best = index
+        return best
+
+    def merge_overlapping(self):
+        '''Replace every group of (transitively) overlapping boxes by the
+        box covering the group, at the place of its first box. Returns the
+        number of boxes removed.'''
+        merged = []
+        first = []
+        boxes = self.boxes()
+        grid = GridIndex(cell=cell_size(boxes))
+        for index, box in enumerate(boxes):
+            while True:
+                hits = [j for j in grid.near(box) if overlaps(merged[j], box)]
+                if not hits:
+                    break
+                # the grown box may now reach further boxes
+                for j in hits:
+                    box = union(box, merged[j])
+                    index = min(index, first[j])
+                    grid.remove(j, merged[j])
+                    merged[j] = None
+            grid.insert(len(merged), box)
+            merged.append(box)
+            first.append(index)
+        boxes = [box for i, box in sorted((i, box) for i, box in zip(first, merged)
+                                          if box is not None)]
+        removed = len(self) - len(boxes)
+        if removed:
+            self.clear()
+            self.extend(boxes)
+        return removed
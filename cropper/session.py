@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+'''
+session.py - A queue of images to crop, with the next images prepared in
+a background thread while the current one is being edited.
+'''
+
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+default_prefetch = 2
+
+
+class _Slot(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self.done = threading.Event()
+        self.dropped = False
+        self.result = None
+        self.error = None
+
+    def run(self, prepare):
+        try:
+            self.result = prepare(self.filename)
+        except Exception as e:
+            self.error = e
+        self.done.set()
+
+
+class Session(object):
+    '''Walks a list of files. prepare(filename) is called for the current
+    file and, in a background thread, for the next `prefetch` files.'''
+
+    def __init__(self, filenames, prepare, prefetch=default_prefetch):
+        self.filenames = list(filenames)
+        self.index = 0
+        self.prepare = prepare
+        self.prefetch = prefetch
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def __len__(self):
+        return len(self.filenames)
+
+    @property
+    def filename(self):
+        return self.filenames[self.index]
+
+    def has_next(self):
+        return self.index + 1 < len(self.filenames)
+
+    def has_prev(self):
+        return self.index > 0
+
+    def move(self, step):
+        index = self.index + step
+        if index < 0 or index >= len(self.filenames):
+            return False
+        self.index = index
+        return True
+
+    def get(self):
+        '''Return prepare() of the current file, waiting for the prefetch
+        if it is already in progress, and queue the following files.'''
+        with self._lock:
+            slot = self._slots.pop(self.index, None)
+        if slot is None:
+            slot = _Slot(self.filename)
+            slot.run(self.prepare)
+        else:
+            slot.done.wait()
+        self._schedule()
+        if slot.error:
+            raise slot.error
+        return slot.result
+
+    def _schedule(self):
+        wanted = range(self.index + 1,
+                       min(self.index + 1 + self.prefetch, len(self.filenames)))
+        with self._lock:
+            for index in list(self._slots):
+                if index not in wanted:
+                    self._slots.pop(index).dropped = True
+            for index in wanted:
+                if index not in self._slots:
+                    slot = _Slot(self.filenames[index])
+                    self._slots[index] = slot
+                    self._queue.put(slot)
+            if self._worker is None and self._slots:
+                self._worker = threading.Thread(target=self._work)
+                self._worker.daemon = True
+                self._worker.start()
+
+    def _work(self):
+        while True:
+            slot = self._queue.get()
+            if not slot.dropped:
+                slot.run(self.prepare)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+'''
+sidecar.py - Crop rectangles saved next to their image, and a per
+directory index of what batch runs already produced.
+
+A sidecar "page.jpg.crops.json" holds the image hash, the file size and
+time, the image size and every crop box, so the crops can be replayed
+later, also on a rescan at another resolution (boxes are scaled to the
+new size). sidecar_current() tells whether a sidecar still belongs to
+its file, hashing only a file touched since the sidecar was written.
+
+The index ".croppertk-index.json" maps image names to the file state,
+the spec digest and the outputs of the last run; an image whose file
+and spec are unchanged and whose outputs exist is skipped.
+'''
+
+import os
+import json
+import hashlib
+
+sidecar_ext = '.crops.json'
+index_name = '.croppertk-index.json'
+
+
+def file_hash(filename, blocksize=1024 * 1024):
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        while True:
+            block = f.read(blocksize)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_state(filename):
+    st = os.stat(filename)
+    return [st.st_size, int(st.st_mtime)]
+
+
+def sidecar_name(filename):
+    return filename + sidecar_ext
+
+
+def write_json(filename, data):
+    # write then rename, so an interrupted run never leaves half a file
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(',', ':'), sort_keys=True)
+    getattr(os, 'replace', os.rename)(tmp, filename)
+
+
+def write_sidecar(filename, size, boxes):
+    write_json(sidecar_name(filename), {
+        'image': os.path.basename(filename),
+        'hash': file_hash(filename),
+        'state': file_state(filename),
+        'size': list(size),
+        'rects': [list(box) for box in boxes],
+    })
+
+
+def sidecar_current(filename, data, digest=None):
+    '''True if the sidecar data was written for filename as it is now.
+    A file touched since is compared by its hash, digest if given.'''
+    if data.get('state') == file_state(filename):
+        return True
+    return data.get('hash') == (digest or file_hash(filename))
+
+
+def read_sidecar(filename):
+    '''Return the sidecar of filename as a dict, or None.'''
+    try:
+        with open(sidecar_name(filename)) as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    data['rects'] = [tuple(box) for box in data.get('rects', [])]
+    return data
+
+
+def scale_boxes(boxes, size, newsize):
+    '''Scale boxes drawn on an image of size to one of newsize.'''
+    if tuple(size) == tuple(newsize):
+        return list(boxes)
+    sx = float(newsize[0]) / size[0]
+    sy = float(newsize[1]) / size[1]
+    return [(int(l * sx + 0.5), int(t * sy + 0.5), int(r * sx + 0.5), int(b * sy + 0.5))
+            for l, t, r, b in boxes]
+
+
+def spec_digest(*args):
+    return hashlib.sha1(json.dumps(args, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class Index(object):
+    '''The index of one directory.'''
+
+    def __init__(self, dirname):
+        self.filename = os.path.join(dirname, index_name)
+        try:
+            with open(self.filename) as f:
+                self.entries = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.entries = {}
+
+    def is_current(self, filename, digest):
+        '''True if filename was cropped with digest and is unchanged.'''
+        entry = self.entries.get(os.path.basename(filename))
+        if not entry or entry.get('spec') != digest:
+            return False
+        if entry.get('state') != file_state(filename):
+            # touched but maybe not changed: compare contents
+            if entry.get('hash') != file_hash(filename):
+                return False
+            entry['state'] = file_state(filename)
+        dirname = os.path.dirname(filename)
+        return all(os.path.exists(os.path.join(dirname, f))
+                   for f in entry.get('outputs', []))
+
+    def update(self, filename, digest, outputs):
+        self.entries[os.path.basename(filename)] = {
+            'state': file_state(filename),
+            'hash': file_hash(filename),
+            'spec': digest,
+            'outputs': [os.path.basename(f) for f in outputs],
+        }
+
+    def save(self):
+        write_json(self.filename, self.entries)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+'''
+source.py - An image file opened for cropping.
+
+The preview pyramid is available as soon as the source is created. For
+JPEG files it comes from a reduced (draft) decode, and the full resolution
+image is decoded in a background thread; `image` waits for it. Huge
+uncompressed TIFF files are not decoded at all: `image` is a TiledImage
+that decodes the parts that are used (tiled.py).
+'''
+
+import threading
+
+from PIL import Image
+
+from cropper.pyramid import Pyramid, fit_size
+from cropper.tiled import open_tiled, tiled_min_bytes
+from cropper.timing import image_args, span
+
+# largest side of the first pyramid level of a tiled source
+tiled_preview = 4096
+
+
+class ImageSource(object):
+    def __init__(self, filename, size, cache_bytes=None):
+        self.filename = filename
+        image = Image.open(filename)
+        self.size = image.size
+        self.mode = image.mode
+        self.format = image.format
+        self._image = None
+        self._error = None
+        self._ready = threading.Event()
+
+        w, h = self.size
+        tiled = None
+        if image.format == 'TIFF' and w * h * len(image.getbands()) > tiled_min_bytes:
+            tiled = open_tiled(filename, cache_bytes)
+        if tiled:
+            self._set_image(tiled)
+            factor = 1
+            while max(w, h) // factor > tiled_preview:
+                factor *= 2
+            self.pyramid = Pyramid(tiled.reduce(factor), size, factor)
+            self.pyramid.levels.insert(0, (tiled, 1))
+            return
+
+        if image.format == 'JPEG':
+            w, h = self.size
+            image.draft(image.mode, fit_size(w, h, size))
+        image.load()
+        if image.size == self.size:
+            self._set_image(image)
+            self.pyramid = Pyramid(image, size)
+        else:
+            factor = float(self.size[0]) / image.size[0]
+            self.pyramid = Pyramid(image, size, factor)
+            thread = threading.Thread(target=self._decode)
+            thread.daemon = True
+            thread.start()
+
+    def _set_image(self, image):
+        self._image = image
+        self._ready.set()
+
+    def _decode(self):
+        try:
+            with span('decode', **image_args(self)):
+                image = Image.open(self.filename)
+                image.load()
+            self.pyramid.set_base(image)
+        except Exception as e:
+            self._error = e
+            image = None
+        self._set_image(image)
+
+    @property
+    def image(self):
+        '''The full resolution image, decoded on first use.'''
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self._image
+
+    def thumbnail(self, box, size):
+        '''Preview of box, waiting for the full decode if the draft
+        does not have enough pixels.'''
+        if not self.pyramid.has_level(box, size):
+            self.image
+        return self.pyramid.thumbnail(box, size)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+'''
+spatial.py - A uniform grid over crop boxes for hit tests and overlaps.
+
+GridIndex files the number of each box under every grid cell the box
+touches, so a click or a box query only looks at the few boxes of the
+cells it covers, however many boxes the page has. The cell size follows
+the boxes it is built for (about their mean size); boxes spanning more
+than max_cells cells are kept aside and always checked.
+'''
+
+default_cell = 256
+min_cell = 32
+max_cells = 64
+
+
+def overlaps(a, b):
+    '''True if boxes a and b share some area.'''
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def cell_size(boxes):
+    '''Grid cell about the mean size of boxes.'''
+    if not boxes:
+        return default_cell
+    side = sum(max(b[2] - b[0], b[3] - b[1]) for b in boxes) // len(boxes)
+    return max(min_cell, side)
+
+
+class GridIndex(object):
+    def __init__(self, boxes=(), cell=None):
+        boxes = list(boxes)
+        if cell is None:
+            cell = cell_size(boxes)
+        self.cell = cell
+        self.cells = {}
+        self.large = set()
+        for i, box in enumerate(boxes):
+            self.insert(i, box)
+
+    def _span(self, box):
+        # closed: a box also files under the cell of its right and bottom
+        # edges, which hit tests count as inside
+        c = self.cell
+        return (box[0] // c, box[1] // c, box[2] // c, box[3] // c)
+
+    def _cells(self, span):
+        for cy in range(span[1], span[3] + 1):
+            for cx in range(span[0], span[2] + 1):
+                yield cx, cy
+
+    def _count(self, span):
+        return (span[2] - span[0] + 1) * (span[3] - span[1] + 1)
+
+    def insert(self, i, box):
+        span = self._span(box)
+        if self._count(span) > max_cells:
+            self.large.add(i)
+            return
+        for key in self._cells(span):
+            self.cells.setdefault(key, set()).add(i)
+
+    def remove(self, i, box):
+        span = self._span(box)
+        if self._count(span) > max_cells:
+            self.large.discard(i)
+            return
+        for key in self._cells(span):
+            numbers = self.cells.get(key)
+            if numbers is not None:
+                numbers.discard(i)
+                if not numbers:
+                    del self.cells[key]
+
+    def near(self, box):
+        '''Numbers of the boxes that may overlap box.'''
+        span = self._span(box)
+        found = set(self.large)
+        if self._count(span) > len(self.cells):
+            # a huge query: walk the cells in use instead
+            for (cx, cy), numbers in self.cells.items():
+                if span[0] <= cx <= span[2] and span[1] <= cy <= span[3]:
+                    found.update(numbers)
+            return found
+        for key in self._cells(span):
+            numbers = self.cells.get(key)
+            if numbers:
+                found.update(numbers)
+        return found
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+'''
+spec.py - Reads crop specifications for batch cropping.
+
+A crop spec maps image file names to either a list of boxes
+(left, top, right, bottom) in image pixels or to the word 'auto'.
+The key '*' holds the spec used for images that are not listed.
+
+Accepted sources:
+ auto           - autocrop every image
+ sidecar        - the boxes saved next to each image (see sidecar.py)
+ spec.json      - a list of boxes used for every image, or an object
+                  {"name.jpg": [[l, t, r, b], ...], "other.jpg": "auto"},
+                  or a template (template.py) used for every image
+ spec.csv       - rows "name.jpg,l,t,r,b" or "name.jpg,auto"
+'''
+
+import os
+import csv
+import json
+
+AUTO = 'auto'
+SIDECAR = 'sidecar'
+
+
+def load_spec(source):
+    if source in (AUTO, SIDECAR):
+        return {'*': source}
+    e = os.path.splitext(source)[1].lower()
+    if e == '.csv':
+        return _load_csv(source)
+    return _load_json(source)
+
+
+def _load_json(source):
+    with open(source) as f:
+        data = json.load(f)
+    if isinstance(data, dict) and data.get('template'):
+        return {'*': data}
+    if isinstance(data, dict):
+        spec = {}
+        for name, rects in data.items():
+            spec[name] = _parse_rects(rects)
+        return spec
+    return {'*': _parse_rects(data)}
+
+
+def _load_csv(source):
+    spec = {}
+    with open(source) as f:
+        for row in csv.reader(f):
+            row = [c.strip() for c in row]
+            if not row or not row[0] or row[0].startswith('#'):
+                continue
+            name = row[0]
+            if len(row) == 2 and row[1].lower() == AUTO:
+                spec[name] = AUTO
+                continue
+            if len(row) != 5:
+                raise ValueError('%s: bad crop row %r' % (source, row))
+            rects = spec.get(name)
+            if not isinstance(rects, list):
+                rects = spec[name] = []
+            rects.append(_parse_box(row[1:]))
+    return spec
+
+
+def _parse_rects(rects):
+    if isinstance(rects, str) and rects.lower() == AUTO:
+        return AUTO
+    return [_parse_box(box) for box in rects]
+
+
+def _parse_box(box):
+    if len(box) != 4:
+        raise ValueError('crop box needs 4 values: %r' % (box,))
+    x1, y1, x2, y2 = [int(round(float(v))) for v in box]
+    return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+
+def rects_for(spec, filename):
+    '''Return the boxes or AUTO for filename, or None if it has no spec.'''
+    for key in (filename, os.path.basename(filename)):
+        if key in spec:
+            return spec[key]
+    return spec.get('*')
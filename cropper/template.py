@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+'''
+template.py - Crop boxes drawn on one scan, reused on scans of the same
+layout.
+
+A template stores the boxes with the size of the reference image and
+either:
+ anchor 'size'     - boxes scale with the image size; each target is
+                     aligned to the reference by correlating the row and
+                     column darkness profiles of downscaled copies, which
+                     absorbs scanner drift;
+ anchor 'content'  - boxes follow the autocrop content box of each target.
+
+A sidecar (sidecar.py) is a template with anchor 'size' and no profiles.
+'''
+
+import os
+import sys
+import json
+import argparse
+
+from PIL import Image
+
+from cropper.autocrop import autocrop_box
+from cropper.lazy import optional
+from cropper.sidecar import read_sidecar, scale_boxes
+
+profile_size = 512
+# largest drift searched, as a fraction of the image size
+max_shift = 0.05
+
+
+def _small(image, size):
+    w, h = image.size
+    factor = max(1, min(w // size[0], h // size[1]))
+    if not isinstance(image, Image.Image):
+        # a tiled source: read a band at a time, it converts '1' itself
+        image = image.reduce(factor)
+    elif factor > 1 and hasattr(image, 'reduce'):
+        if image.mode in ('1', 'P'):
+            # reduce() does not average these modes
+            image = image.convert('L')
+        image = image.reduce(factor)
+    if image.mode != 'L':
+        image = image.convert('L')
+    return image.resize(size)
+
+
+def profiles(image, size):
+    '''Row and column darkness profiles of image resampled to size.'''
+    numpy = optional('numpy')
+    a = 255.0 - numpy.asarray(_small(image, size), dtype=numpy.float32)
+    return a.mean(axis=1), a.mean(axis=0)
+
+
+def _lag(ref, cur):
+    '''Shift of cur against ref that best lines up the two profiles.'''
+    numpy = optional('numpy')
+    ref = ref - ref.mean()
+    cur = cur - cur.mean()
+    n = len(ref)
+    shift = max(1, int(n * max_shift))
+    corr = numpy.correlate(cur, ref, 'full')
+    overlap = n - numpy.abs(numpy.arange(-(n - 1), n))
+    corr = corr / overlap
+    window = corr[n - 1 - shift:n + shift]
+    k = int(numpy.argmax(window))
+    lag = float(k - shift)
+    if 0 < k < len(window) - 1:
+        # parabola through the peak for a sub-sample shift
+        a, c, b = window[k - 1], window[k], window[k + 1]
+        if a - 2 * c + b < 0:
+            lag += 0.5 * (a - b) / (a - 2 * c + b)
+    return lag
+
+
+def make_template(image, boxes, anchor='size'):
+    w, h = image.size
+    template = {
+        'template': 1,
+        'anchor': anchor,
+        'size': [w, h],
+        'rects': [list(box) for box in boxes],
+    }
+    if anchor == 'content':
+        template['content'] = list(autocrop_box(image) or (0, 0, w, h))
+    elif optional('numpy') is not None:
+        scale = float(profile_size) / max(w, h)
+        size = (max(int(w * scale), 1), max(int(h * scale), 1))
+        rows, cols = profiles(image, size)
+        template['profile'] = [list(size), rows.round(2).tolist(), cols.round(2).tolist()]
+    return template
+
+
+def align(template, image):
+    '''Offset (dx, dy) in image pixels of image against the template.'''
+    numpy = optional('numpy')
+    if numpy is None or 'profile' not in template:
+        return 0, 0
+    size, rows, cols = template['profile']
+    size = tuple(size)
+    cur_rows, cur_cols = profiles(image, size)
+    dy = _lag(numpy.array(rows), cur_rows)
+    dx = _lag(numpy.array(cols), cur_cols)
+    w, h = image.size
+    return int(round(dx * float(w) / size[0])), int(round(dy * float(h) / size[1]))
+
+
+def template_boxes(template, image):
+    '''The template boxes placed on image.'''
+    if template.get('anchor') == 'content':
+        content = autocrop_box(image)
+        if content:
+            l, t, r, b = template['content']
+            sx = float(content[2] - content[0]) / max(r - l, 1)
+            sy = float(content[3] - content[1]) / max(b - t, 1)
+            return [(int(content[0] + (x0 - l) * sx + 0.5), int(content[1] + (y0 - t) * sy + 0.5),
+                     int(content[0] + (x1 - l) * sx + 0.5), int(content[1] + (y1 - t) * sy + 0.5))
+                    for x0, y0, x1, y1 in template['rects']]
+    boxes = scale_boxes(template['rects'], template['size'], image.size)
+    dx, dy = align(template, image)
+    return [(l + dx, t + dy, r + dx, b + dy) for l, t, r, b in boxes]
+
+
+def write_template(filename, template):
+    with open(filename, 'w') as f:
+        json.dump(template, f, separators=(',', ':'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Make a crop template from an image and its saved boxes')
+    parser.add_argument(
+        '-o',
+        '--outfile',
+        metavar='outfile',
+        type=str,
+        default=None,
+        help='template file name, default image name + .template.json')
+    parser.add_argument(
+        '--anchor',
+        choices=('size', 'content'),
+        default='size',
+        help='place boxes by image size (aligned) or by content box, default size')
+    parser.add_argument('filename', help='reference image with a .crops.json sidecar')
+    args = parser.parse_args(argv)
+
+    data = read_sidecar(args.filename)
+    if not data:
+        parser.error('%s has no saved crop boxes' % args.filename)
+    image = Image.open(args.filename)
+    outfile = args.outfile or os.path.splitext(args.filename)[0] + '.template.json'
+    boxes = scale_boxes(data['rects'], data['size'], image.size)
+    write_template(outfile, make_template(image, boxes, args.anchor))
+    print (outfile)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
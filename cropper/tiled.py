@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+'''
+tiled.py - Lazy access to huge uncompressed TIFF files.
+
+The file is memory-mapped and split into blocks (its tiles, or bands of
+block_rows rows of its strips). Only the blocks touched by a crop are
+decoded, and decoded blocks are kept in an LRU cache limited to a byte
+budget. TiledImage offers the few Image methods the cropper uses on a
+source: crop(), reduce() and resize().
+'''
+
+import mmap
+
+from PIL import Image
+
+from cropper.lru import LRUCache, image_bytes
+
+tile_cache_bytes = 256 * 1024 * 1024
+block_rows = 256
+# smaller images are simply decoded as a whole
+tiled_min_bytes = 512 * 1024 * 1024
+
+
+def open_tiled(filename, cache_bytes=None):
+    '''Return a TiledImage for an uncompressed TIFF, or None if the file
+    is not one (compressed, planar or palette data are decoded by PIL).'''
+    image = Image.open(filename)
+    if (image.format != 'TIFF' or image.mode == 'P' or not image.tile or
+            getattr(image, '_planar_configuration', 1) != 1):
+        return None
+    for tile in image.tile:
+        if tile[0] != 'raw':
+            return None
+    bps = image.tag_v2.get(258, 1)
+    if isinstance(bps, tuple):
+        bits = sum(bps)
+    else:
+        bits = bps * image.tag_v2.get(277, 1)
+
+    blocks = []
+    for codec, extents, offset, args in image.tile:
+        x0, y0, x1, y1 = extents
+        rawmode, stride = args[0], int(args[1])
+        rowbytes = stride or ((x1 - x0) * bits + 7) // 8
+        for y in range(y0, y1, block_rows):
+            yb = min(y + block_rows, y1)
+            blocks.append(((x0, y, x1, yb), offset + (y - y0) * rowbytes,
+                           rawmode, rowbytes))
+    image.close()
+    return TiledImage(filename, image.mode, image.size, blocks,
+                      cache_bytes or tile_cache_bytes)
+
+
+class TiledImage(object):
+    format = 'TIFF'
+
+    def __init__(self, filename, mode, size, blocks, cache_bytes):
+        self.filename = filename
+        self.mode = mode
+        self.size = size
+        self.blocks = blocks
+        self.cache = LRUCache(cache_bytes, image_bytes)
+        with open(filename, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def getbands(self):
+        return Image.new(self.mode, (1, 1)).getbands()
+
+    def _block(self, index):
+        tile = self.cache.get(index)
+        if tile is None:
+            (x0, y0, x1, y1), offset, rawmode, rowbytes = self.blocks[index]
+            data = self.map[offset:offset + rowbytes * (y1 - y0)]
+            tile = Image.frombytes(self.mode, (x1 - x0, y1 - y0), data,
+                                   'raw', rawmode, rowbytes, 1)
+            self.cache.put(index, tile)
+        return tile
+
+    def crop(self, box):
+        left, top, right, bottom = [int(v) for v in box]
+        out = Image.new(self.mode, (right - left, bottom - top))
+        for index, block in enumerate(self.blocks):
+            x0, y0, x1, y1 = block[0]
+            if x1 <= left or x0 >= right or y1 <= top or y0 >= bottom:
+                continue
+            tile = self._block(index)
+            ix0 = max(x0, left)
+            iy0 = max(y0, top)
+            ix1 = min(x1, right)
+            iy1 = min(y1, bottom)
+            out.paste(tile.crop((ix0 - x0, iy0 - y0, ix1 - x0, iy1 - y0)),
+                      (ix0 - left, iy0 - top))
+        return out
+
+    def reduce(self, factor, box=None):
+        '''Image.reduce(), done a band of rows at a time.'''
+        if box is None:
+            box = (0, 0) + self.size
+        left, top, right, bottom = box
+        mode = 'L' if self.mode == '1' else self.mode
+        out = Image.new(mode, (-(-(right - left) // factor), -(-(bottom - top) // factor)))
+        step = max(block_rows // factor, 1) * factor
+        for y in range(top, bottom, step):
+            band = self.crop((left, y, right, min(y + step, bottom)))
+            if band.mode != mode:
+                band = band.convert(mode)
+            out.paste(band.reduce(factor), (0, (y - top) // factor))
+        return out
+
+    def resize(self, size, resample=None, box=None):
+        if box is None:
+            box = (0, 0) + self.size
+        l, t, r, b = box
+        # the filter reads a few source pixels around the box
+        pad = int(3 * max(float(r - l) / size[0], float(b - t) / size[1], 1)) + 1
+        w, h = self.size
+        cbox = (max(int(l) - pad, 0), max(int(t) - pad, 0),
+                min(int(r) + pad + 1, w), min(int(b) + pad + 1, h))
+        region = self.crop(cbox)
+        return region.resize(size, resample, box=(l - cbox[0], t - cbox[1],
+                                                  r - cbox[0], b - cbox[1]))
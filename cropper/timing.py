@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+'''
+timing.py - Optional timing of the hot paths, written as a Chrome trace.
+
+Off unless enabled with enable(filename), the --profile option of the
+front ends or the CROPPER_PROFILE environment variable. Each span records
+wall time, resident memory and its arguments (image size and mode); at
+exit the events are written as trace-event JSON (chrome://tracing,
+https://ui.perfetto.dev) and a per-name summary goes to stderr. Spans
+from worker processes are not collected.
+'''
+
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import threading
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+env_var = 'CROPPER_PROFILE'
+
+timer = getattr(time, 'perf_counter', time.time)
+
+enabled = False
+_filename = None
+_events = []
+_lock = threading.Lock()
+_start = timer()
+_pagesize = 4096
+if hasattr(os, 'sysconf'):
+    try:
+        _pagesize = os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError):
+        pass
+
+
+def rss_kb():
+    '''Current resident set size in KiB (peak if the current is unknown).'''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _pagesize // 1024
+    except (IOError, OSError, IndexError, ValueError):
+        pass
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024
+    return rss
+
+
+def image_args(image):
+    '''Size and mode of a PIL image (or an ImageSource) for span args.'''
+    if image is None:
+        return {}
+    return {'size': '%dx%d' % tuple(image.size), 'mode': image.mode}
+
+
+def source_args(app):
+    '''image_args() of the source shown by an Application.'''
+    return image_args(getattr(app, 'source', None))
+
+
+def enable(filename):
+    global enabled, _filename
+    if not enabled:
+        atexit.register(write)
+    enabled = True
+    _filename = filename
+
+
+def _record(name, t0, t1, rss0, rss1, args):
+    args = dict(args or {})
+    args['rss_kb'] = rss1
+    args['rss_delta_kb'] = rss1 - rss0
+    ts = (t0 - _start) * 1e6
+    event = {'name': name, 'ph': 'X', 'pid': os.getpid(),
+             'tid': threading.current_thread().ident,
+             'ts': ts, 'dur': (t1 - t0) * 1e6, 'args': args}
+    counter = {'name': 'rss', 'ph': 'C', 'pid': os.getpid(),
+               'ts': (t1 - _start) * 1e6, 'args': {'kb': rss1}}
+    with _lock:
+        _events.append(event)
+        _events.append(counter)
+
+
+class span(object):
+    '''with span('name', size=...) as s: ...; s.args can be added to.'''
+
+    def __init__(self, name, **args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        if enabled:
+            self.rss0 = rss_kb()
+            self.t0 = timer()
+        return self
+
+    def __exit__(self, *exc):
+        if enabled:
+            t1 = timer()
+            _record(self.name, self.t0, t1, self.rss0, rss_kb(), self.args)
+        return False
+
+
+def timed(name, args=None):
+    '''Decorator: a span around the call; args(self) is evaluated after
+    the call, so it sees what the method loaded.'''
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *a, **kw):
+            if not enabled:
+                return fn(self, *a, **kw)
+            rss0 = rss_kb()
+            t0 = timer()
+            try:
+                return fn(self, *a, **kw)
+            finally:
+                t1 = timer()
+                extra = None
+                if args:
+                    try:
+                        extra = args(self)
+                    except Exception:
+                        extra = None
+                _record(name, t0, t1, rss0, rss_kb(), extra)
+        return wrapper
+    return decorate
+
+
+def summary():
+    '''{name: (count, total seconds, max seconds)} of the recorded spans.'''
+    result = {}
+    with _lock:
+        events = [e for e in _events if e['ph'] == 'X']
+    for e in events:
+        count, total, longest = result.get(e['name'], (0, 0.0, 0.0))
+        dur = e['dur'] / 1e6
+        result[e['name']] = (count + 1, total + dur, max(longest, dur))
+    return result
+
+
+def write(filename=None):
+    filename = filename or _filename
+    if not filename:
+        return
+    with _lock:
+        events = list(_events)
+    meta = [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+             'args': {'name': os.path.basename(sys.argv[0] or 'cropper')}}]
+    data = {'traceEvents': meta + events, 'displayTimeUnit': 'ms',
+            'otherData': {'argv': sys.argv, 'exit_rss_kb': rss_kb()}}
+    with open(filename, 'w') as f:
+        json.dump(data, f)
+    stats = summary()
+    sys.stderr.write('%-24s %6s %10s %10s %10s\n' % (
+        'span', 'count', 'total s', 'mean ms', 'max ms'))
+    for name in sorted(stats, key=lambda n: -stats[n][1]):
+        count, total, longest = stats[name]
+        sys.stderr.write('%-24s %6d %10.3f %10.2f %10.2f\n' % (
+            name, count, total, total * 1000.0 / count, longest * 1000.0))
+    sys.stderr.write('trace: %s\n' % filename)
+
+
+if os.environ.get(env_var):
+    enable(os.environ[env_var])
@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+'''
+watch.py - Autocrops scans as they arrive in a hot folder.
+
+The process stays resident: a pool of worker processes (with NumPy and
+the encoders already imported) takes each new scan, autocrops it and
+writes the crops to the output tree, which mirrors the subfolders of the
+hot folder. The scan is moved next to its crops with a sidecar of the
+boxes, so the hot folder only holds work still to do.
+
+New files are seen through inotify on Linux (a file is ready when its
+writer closes it or it is moved in) and by listing the tree every few
+seconds elsewhere or with --poll (ready when its size and time stay the
+same between two looks). At most backlog scans are queued on the pool;
+while it is full the watcher waits, and inotify keeps the events.
+
+Ctrl-C or SIGTERM stops the watching; the scans already queued (at most
+backlog) are finished before the process exits. A scan leaves the hot
+folder only after its crops are written, so a scan cut short by a kill
+is simply done again at the next start.
+
+Pages autocrop is unsure about (nothing found, content over the whole
+page, many small blocks) and pages that fail are moved to the review
+folder instead, with the proposed boxes in their sidecar, where
+croppertk.py shows them for correction.
+'''
+
+import os
+import sys
+import time
+import errno
+import select
+import shutil
+import signal
+import struct
+import argparse
+import threading
+import multiprocessing
+
+from PIL import Image
+
+from cropper.batch import (add_autocrop_arguments, auto_rects, autocrop_options,
+                           image_exts, save_crops)
+from cropper.encode import add_encoder_arguments, encoder_settings, output_exts
+from cropper.lazy import optional
+from cropper.sidecar import sidecar_name, write_sidecar
+
+default_interval = 2.0
+# pages where content covers more than this share look like a dark
+# background or an open lid, not like clippings
+max_cover = 0.97
+# more blocks than this are dust or a textured background
+max_blocks = 32
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0x00080000
+event_header = struct.Struct('iIII')
+
+
+def is_scan(filename):
+    name = os.path.basename(filename)
+    return (not name.startswith('.') and '__crop__' not in name and
+            os.path.splitext(name)[1].lower() in image_exts)
+
+
+def scan_tree(top, exclude=()):
+    '''Scans under top, in name order, skipping the exclude folders.'''
+    found = []
+    for dirpath, dirnames, filenames in os.walk(top):
+        dirnames[:] = sorted(d for d in dirnames
+                             if not d.startswith('.') and
+                             os.path.abspath(os.path.join(dirpath, d)) not in exclude)
+        found.extend(os.path.join(dirpath, f) for f in sorted(filenames)
+                     if is_scan(f))
+    return found
+
+
+def review_reason(image, boxes):
+    '''Why autocrop may be wrong about boxes on image, None if it looks
+    right.'''
+    if not boxes:
+        return 'no content found'
+    if len(boxes) > max_blocks:
+        return '%d blocks' % len(boxes)
+    w, h = image.size
+    for box in boxes:
+        if (box[2] - box[0]) * (box[3] - box[1]) > max_cover * w * h:
+            return 'content fills the page'
+    return None
+
+
+def free_name(filename):
+    '''filename, or filename with -1, -2... added if it is taken.'''
+    base, ext = os.path.splitext(filename)
+    n = 0
+    while os.path.exists(filename) or os.path.exists(sidecar_name(filename)):
+        n += 1
+        filename = '%s-%d%s' % (base, n, ext)
+    return filename
+
+
+def _makedirs(dirname):
+    try:
+        os.makedirs(dirname)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def _move(filename, dest):
+    _makedirs(os.path.dirname(dest))
+    shutil.move(filename, dest)
+    return dest
+
+
+def watch_image(job):
+    '''Worker: autocrop one arrived scan into the output tree, or move it
+    to the review folder. job is (filename, relative name, autoopts,
+    output folder, review folder).
+
+    Returns (filename, new name, [saved file names], review reason or
+    None, error message or None).'''
+    filename, relname, autoopts, outdir, reviewdir = job
+    if not os.path.exists(filename):
+        # an event for a scan already done
+        return filename, None, [], None, None
+    image = None
+    boxes = []
+    try:
+        image = Image.open(filename)
+        image.load()
+        boxes = auto_rects(image, autoopts)
+        reason = review_reason(image, boxes)
+        if reason:
+            dest = _move(filename, free_name(os.path.join(reviewdir, relname)))
+            write_sidecar(dest, image.size, boxes)
+            return filename, dest, [], reason, None
+        dest = free_name(os.path.join(outdir, relname))
+        _makedirs(os.path.dirname(dest))
+        # crops first: a lossless crop reads the scan where it is
+        saved = save_crops(image, dest, boxes, autoopts)
+        _move(filename, dest)
+        write_sidecar(dest, image.size, boxes)
+    except Exception as e:
+        dest = None
+        try:
+            dest = _move(filename, free_name(os.path.join(reviewdir, relname)))
+            if image is not None:
+                write_sidecar(dest, image.size, boxes)
+        except (IOError, OSError):
+            pass
+        return filename, dest, [], None, str(e)
+    return filename, dest, saved, None, None
+
+
+def _init_worker():
+    # Ctrl-C and service managers signal the whole group: the watcher
+    # lets the workers finish the queue. Import now, not per scan.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    optional('numpy')
+
+
+class Poller(object):
+    '''Finds ready scans by listing the tree every interval seconds.'''
+
+    def __init__(self, top, exclude=(), interval=default_interval):
+        self.top = top
+        self.exclude = exclude
+        self.interval = interval
+        self.seen = {}
+
+    def check(self, filenames):
+        '''The filenames whose size and time are those of the last check;
+        the others are remembered for the next one.'''
+        ready = []
+        seen = {}
+        for filename in filenames:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            key = (st.st_size, st.st_mtime)
+            if self.seen.get(filename) == key:
+                ready.append(filename)
+            else:
+                seen[filename] = key
+        self.seen = seen
+        return ready
+
+    def close(self):
+        pass
+
+    def events(self):
+        while True:
+            for filename in self.check(scan_tree(self.top, self.exclude)):
+                yield filename
+            time.sleep(self.interval)
+
+
+class Inotify(Poller):
+    '''Finds ready scans through inotify. Scans that were there before a
+    folder was watched are checked as the Poller does.'''
+
+    mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, top, exclude=(), interval=default_interval):
+        Poller.__init__(self, top, exclude, interval)
+        import ctypes
+        import ctypes.util
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                               use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+            self.fd = libc.inotify_init1(IN_CLOEXEC)
+        except (OSError, AttributeError):
+            raise OSError('inotify is not available')
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._errno = ctypes.get_errno
+        self.dirs = {}
+
+    def close(self):
+        os.close(self.fd)
+
+    def watch_tree(self, top):
+        '''Watch top and its subfolders; returns the scans already there.'''
+        encode = getattr(os, 'fsencode', lambda s: s)
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames
+                           if not d.startswith('.') and
+                           os.path.abspath(os.path.join(dirpath, d)) not in self.exclude]
+            wd = self._add_watch(self.fd, encode(dirpath), self.mask)
+            if wd < 0:
+                raise OSError(self._errno(), 'cannot watch %s' % dirpath)
+            self.dirs[wd] = dirpath
+        return scan_tree(top, self.exclude)
+
+    def _read(self):
+        decode = getattr(os, 'fsdecode', lambda s: s)
+        data = os.read(self.fd, 64 * 1024)
+        pos = 0
+        while pos < len(data):
+            wd, mask, cookie, length = event_header.unpack_from(data, pos)
+            pos += event_header.size
+            name = decode(data[pos:pos + length].rstrip(b'\0'))
+            pos += length
+            yield wd, mask, name
+
+    def events(self):
+        settle = set(self.watch_tree(self.top))
+        self.check(settle)
+        while True:
+            readable = select.select([self.fd], [], [], self.interval)[0]
+            if not readable:
+                ready = self.check(settle)
+                settle = set(self.seen)
+                for filename in ready:
+                    yield filename
+                continue
+            for wd, mask, name in self._read():
+                if mask & IN_Q_OVERFLOW:
+                    # events were lost: look at everything again
+                    settle.update(scan_tree(self.top, self.exclude))
+                    continue
+                dirpath = self.dirs.get(wd)
+                if dirpath is None or not name:
+                    continue
+                path = os.path.join(dirpath, name)
+                if mask & IN_ISDIR:
+                    if (mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith('.') and
+                            os.path.abspath(path) not in self.exclude):
+                        settle.update(self.watch_tree(path))
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and is_scan(path):
+                    settle.discard(path)
+                    yield path
+
+
+class Watcher(object):
+    '''Feeds the scans arriving in hotdir to a pool of processes, never
+    more than backlog at a time.'''
+
+    def __init__(self, hotdir, outdir, reviewdir, autoopts, processes=None,
+                 backlog=None, poll=False, interval=default_interval):
+        self.hotdir = hotdir
+        self.outdir = outdir
+        self.reviewdir = reviewdir
+        self.autoopts = autoopts
+        self.processes = processes or multiprocessing.cpu_count()
+        self.slots = threading.BoundedSemaphore(backlog or 2 * self.processes)
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.failed = set()
+        exclude = set(os.path.abspath(d) for d in (outdir, reviewdir))
+        self.source = None
+        if not poll:
+            try:
+                self.source = Inotify(hotdir, exclude, interval)
+            except OSError as e:
+                print ('%s, polling every %g s' % (e, interval))
+        if self.source is None:
+            self.source = Poller(hotdir, exclude, interval)
+        self.pool = None
+
+    def submit(self, filename):
+        with self.lock:
+            if filename in self.pending or filename in self.failed:
+                return
+            self.pending.add(filename)
+        # back-pressure: wait for a free place in the queue
+        self.slots.acquire()
+        relname = os.path.relpath(filename, self.hotdir)
+        self.pool.apply_async(watch_image, ((filename, relname, self.autoopts,
+                                             self.outdir, self.reviewdir),),
+                              callback=self.done)
+
+    def done(self, result):
+        # runs in the result thread of the pool
+        filename, dest, saved, reason, error = result
+        if error:
+            print ('%s: %s' % (filename, error))
+        elif reason:
+            print ('%s: %s, moved to %s' % (filename, reason, dest))
+        elif dest:
+            print ('%s: %d crops in %s' % (filename, len(saved), os.path.dirname(dest)))
+        with self.lock:
+            self.pending.discard(filename)
+            if dest is None and error:
+                # still in the hot folder: do not try it again
+                self.failed.add(filename)
+        self.slots.release()
+
+    def run(self):
+        self.pool = multiprocessing.Pool(self.processes, _init_worker)
+        signal.signal(signal.SIGINT, _stop)
+        signal.signal(signal.SIGTERM, _stop)
+        print ('watching %s' % self.hotdir)
+        try:
+            for filename in self.source.events():
+                self.submit(filename)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.source.close()
+            if self.pending:
+                print ('finishing %d scans' % len(self.pending))
+            self.pool.close()
+            self.pool.join()
+
+
+def _stop(signum, frame):
+    # once: a second signal must not break off the join
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Cropper Image (watch a hot folder)')
+    parser.add_argument('--watch', action='store_true',
+                        help=argparse.SUPPRESS)
+    add_autocrop_arguments(parser)
+    parser.add_argument(
+        '-o',
+        '--output',
+        metavar='dir',
+        type=str,
+        default=None,
+        help='output tree, default hotdir-cropped')
+    parser.add_argument(
+        '-R',
+        '--review',
+        metavar='dir',
+        type=str,
+        default=None,
+        help='folder for pages to check in the GUI, default hotdir-review')
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        metavar='jobs',
+        type=int,
+        default=None,
+        help='worker processes, default is the number of CPUs')
+    parser.add_argument(
+        '-b',
+        '--backlog',
+        metavar='scans',
+        type=int,
+        default=None,
+        help='scans queued on the workers at most, default twice the workers')
+    parser.add_argument(
+        '-p',
+        '--poll',
+        action='store_true',
+        help='list the folder every interval instead of using inotify')
+    parser.add_argument(
+        '-I',
+        '--interval',
+        metavar='seconds',
+        type=float,
+        default=default_interval,
+        help='polling interval, default 2')
+    parser.add_argument(
+        '-l',
+        '--lossless',
+        action='store_true',
+        help='crop jpeg files with jpegtran, without re-encoding')
+    add_encoder_arguments(parser)
+    parser.add_argument('hotdir', help='folder the scanners write to')
+    args = parser.parse_args(argv)
+
+    hotdir = args.hotdir.rstrip(os.sep) or os.sep
+    if not os.path.isdir(hotdir):
+        parser.error('%s is not a folder' % hotdir)
+    options = autocrop_options(args)
+    if args.lossless:
+        options['lossless'] = True
+    settings = encoder_settings(args)
+    if any(settings.values()):
+        options['encoder'] = settings
+    try:
+        exts = output_exts(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if exts:
+        options['exts'] = exts
+    watcher = Watcher(hotdir, args.output or hotdir + '-cropped',
+                      args.review or hotdir + '-review', options,
+                      args.jobs, args.backlog, args.poll, args.interval)
+    watcher.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
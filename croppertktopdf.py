@@ -16,14 +16,26 @@ Note the following packages are required:
 '''
 
 PROGNAME = 'CropperTktoPDF'
-VERSION = '0.20210423'
+VERSION = '0.20261018'
 
 import os
 import sys
 import argparse
 import re
-from PIL import Image, ImageTk, ImageFilter, ImageChops
-from reportlab.pdfgen.canvas import Canvas
+import functools
+
+if __name__ == '__main__' and '--book' in sys.argv[1:]:
+    # headless book mode: never load Tk
+    from cropper import book
+    sys.exit(book.main(sys.argv[1:]))
+
+from PIL import Image
+
+from cropper.encode import add_encoder_arguments, encoder_settings, save
+from cropper.gui import default_tilecache, tk
+from cropper.tiled import block_rows
+from cropper import gui
+from cropper import timing
 
 py_version = sys.version
 
@@ -34,93 +46,30 @@ if py_version[0] == "2":
     if sysenc:
         sys.setdefaultencoding(sysenc)
 
-    import Tkinter as tk
-    import tkFileDialog as tkfd
-
-elif py_version[0] == "3":
-    # for Python3
-    import tkinter as tk
-    from tkinter import filedialog as tkfd
-
-else:
-    pass
-
-thumbsize = 896, 608
-thumboffset = 16
 default_dpi = 300
 default_mindpi = 36
 default_cleanmargin = 0
 default_format = 'png'
 default_div = 1
 
-class Application(tk.Frame):
-    def __init__(self, master=None, filename=None, dpi=default_dpi, iformat=default_format, pdfname=None):
 
-        tk.Frame.__init__(self, master)
-        self.grid()
+class Application(gui.Application):
+    progname = PROGNAME
+    min_rect = 3
+
+    def __init__(self, master=None, filenames=None, dpi=default_dpi, iformat=default_format, pdfname=None, savefiles=True, tilecache=default_tilecache, settings=None):
         self.dpi = dpi
         self.ext = iformat
-        self.createWidgets()
-        self.croprect_start = None
-        self.croprect_end = None
-        self.canvas_rects = []
-        self.crop_rects = []
-        self.region_rect = []
-        self.current_rect = None
-        self.zoommode = False
-        self.countour = False
-        self.acbwmode = False
-        self.zooming = False
-        self.w = 1
-        self.h = 1
-        self.x0 = 0
-        self.y0 = 0
+        self.savefiles = savefiles
         self.div = default_div
         self.cleanmargin = default_cleanmargin
-        self.scale = None
-        self.n = 0
-
-        if not(filename):
-            filenames = tkfd.askopenfilenames(master=self,
-                          defaultextension='.jpg', multiple=1, parent=self,
-                          filetypes=(
-                              (('Image Files'),
-                               '.jpg .JPG .jpeg .JPEG .png .PNG .tif .TIF .tiff .TIFF'),
-                              (('JPEG Image Files'),
-                               '.jpg .JPG .jpeg .JPEG'),
-                              (('PNG Image Files'),
-                               '.png .PNG'),
-                              (('TIFF Image Files'),
-                               '.tif .TIF .tiff .TIFF'),
-                              (('All files'), '*'),
-                          ),
-                          title=('Select images to crop'))
-            if filenames:
-                filename = filenames[0]
-
-        if pdfname:
-            self.outfile = pdfname
-        else:
-            if filename:
-                self.outfile = filename + '.pdf'
-        if filename:
-            self.filename = filename
-            self.loadimage()
-
-    def createWidgets(self):
-        self.canvas = tk.Canvas(
-            self, height=1, width=1, relief=tk.SUNKEN)
-        self.canvas.bind('<Button-1>', self.canvas_mouse1_callback)
-        self.canvas.bind('<ButtonRelease-1>', self.canvas_mouseup1_callback)
-        self.canvas.bind('<B1-Motion>', self.canvas_mouseb1move_callback)
-
-        self.sizeLabel = tk.Label(self, text="0x0")
-
-        self.countourButton = tk.Checkbutton(self, text='X',
-                                              command=self.countour_mode)
-
-        self.workFrame = tk.LabelFrame(self)
+        self.book = None
+        self.outfile = pdfname
+        gui.Application.__init__(self, master, filenames, tilecache, settings)
+        if not self.outfile and self.session.filenames:
+            self.outfile = self.session.filenames[0] + '.pdf'
 
+    def work_widgets(self):
         self.outputFrame = tk.LabelFrame(self.workFrame, text='Output')
 
         self.dpiLabel = tk.Label(self.outputFrame, text='DPI')
@@ -135,31 +84,16 @@ class Application(tk.Frame):
         self.divBox = tk.Text(self.outputFrame, height=1, width=2)
         self.divBox.insert(1.0, str(default_div))
 
+        self.filesButton = tk.Checkbutton(self.outputFrame, text='Files',
+                                              command=self.files_mode)
+        if self.savefiles:
+            self.filesButton.select()
+
         self.dpiLabel.grid(row=0, column=0)
         self.dpiBox.grid(row=0, column=1)
         self.formatLabel.grid(row=0, column=2)
         self.formatBox.grid(row=0, column=3)
-
-        self.zoomFrame = tk.LabelFrame(self.workFrame, text='Zooming')
-
-        self.zoomButton = tk.Checkbutton(self.zoomFrame, text='Zoom',
-                                              command=self.zoom_mode)
-
-        self.unzoomButton = tk.Button(self.zoomFrame, text='<-|->',
-                                           activebackground='#00F', command=self.unzoom_image)
-
-        self.zoomButton.grid(row=0, column=0)
-        self.unzoomButton.grid(row=0, column=1)
-
-        self.autoFrame = tk.LabelFrame(self.workFrame, text='AutoCrop')
-
-        self.autoButton = tk.Button(self.autoFrame, text='Auto', command=self.autocrop)
-
-        self.acbwButton = tk.Checkbutton(self.autoFrame, text='BW',
-                                              command=self.ac_bw_mode)
-
-        self.autoButton.grid(row=0, column=0)
-        self.acbwButton.grid(row=0, column=1)
+        self.filesButton.grid(row=0, column=4)
 
         self.marginFrame = tk.LabelFrame(self.workFrame, text='Margin')
 
@@ -170,53 +104,8 @@ class Application(tk.Frame):
         self.cleanmarginLabel.grid(row=0, column=0)
         self.cleanmarginBox.grid(row=0, column=1)
 
-        self.plusButton = tk.Button(self.workFrame, text='+', command=self.plus_box)
-
-        self.outputFrame.grid(row=0, column=0, padx=5)
-        self.zoomFrame.grid(row=0, column=1, padx=5)
-        self.autoFrame.grid(row=0, column=2, padx=5)
-        self.marginFrame.grid(row=0, column=3, padx=5)
-        self.plusButton.grid(row=0, column=4, padx=5)
-
-
-        self.ActionFrame = tk.LabelFrame(self, text='Action')
-
-        self.resetButton = tk.Button(self.ActionFrame, text='Reset',
-                                          activebackground='#F00', command=self.reset)
-
-        self.undoButton = tk.Button(self.ActionFrame, text='Undo',
-                                         activebackground='#FF0', command=self.undo_last)
-
-        self.goButton = tk.Button(self.ActionFrame, text='Crops',
-                                       activebackground='#0F0', command=self.start_cropping)
-
-        self.quitButton = tk.Button(self.ActionFrame, text='Quit',
-                                         activebackground='#F00', command=self.quit)
-
-        self.resetButton.grid(row=0, column=0)
-        self.undoButton.grid(row=0, column=1)
-        self.goButton.grid(row=0, column=2)
-        self.quitButton.grid(row=0, column=3)
-
-        self.canvas.grid(row=0, columnspan=3)
-        self.countourButton.grid(row=1, column=0)
-        self.workFrame.grid(row=1, column=1)
-        self.ActionFrame.grid(row=1, column=2)
-        self.sizeLabel.grid(row=2, column=0, columnspan=3)
-
-    def set_button_state(self):
-        if self.n > 0:
-            self.plusButton.config(state = 'normal')
-            self.undoButton.config(state = 'normal')
-            self.goButton.config(state = 'normal')
-        else:
-            self.plusButton.config(state = 'disabled')
-            self.undoButton.config(state = 'disabled')
-            self.goButton.config(state = 'disabled')
-        if self.zooming:
-            self.unzoomButton.config(state = 'normal')
-        else:
-            self.unzoomButton.config(state = 'disabled')
+        return [self.outputFrame, self.zoomFrame, self.autoFrame,
+                self.marginFrame, self.plusButton, self.mergeButton]
 
     def verify_params(self):
         self.dpi = int(self.dpiBox.get('1.0', tk.END))
@@ -230,7 +119,8 @@ class Application(tk.Frame):
             (self.ext != 'jpg') and
             (self.ext != 'jpeg') and
             (self.ext != 'tif') and
-                (self.ext != 'tiff')):
+            (self.ext != 'tiff') and
+                (self.ext != 'webp')):
             self.ext = default_format
         if self.div < 1:
             self.div = default_div
@@ -245,380 +135,78 @@ class Application(tk.Frame):
         self.cleanmarginBox.delete('1.0', tk.END)
         self.cleanmarginBox.insert('1.0', str(self.cleanmargin))
 
-    def canvas_mouse1_callback(self, event):
-        self.croprect_start = (event.x, event.y)
-
-    def canvas_mouseb1move_callback(self, event):
-        if self.current_rect:
-            self.canvas.delete(self.current_rect)
-        x1 = self.croprect_start[0]
-        y1 = self.croprect_start[1]
-        x2 = event.x
-        y2 = event.y
-        bbox = (x1, y1, x2, y2)
-        dx = int((x2 - x1) * self.scale[0] * 10 + 0.5) * 0.1
-        dy = int((y2 - y1) * self.scale[1] * 10 + 0.5) * 0.1
-        dt = str(dx) + "x" + str(dy)
-        cr = self.canvas.create_rectangle(bbox)
-        self.current_rect = cr
-        self.sizeLabel.configure(text=dt)
-
-    def canvas_mouseup1_callback(self, event):
-        self.croprect_end = (event.x, event.y)
-        self.set_crop_area()
-        self.canvas.delete(self.current_rect)
-        self.current_rect = None
-
-    def set_crop_area(self):
-        r = Rect(self.croprect_start, self.croprect_end)
-
-        # adjust dimensions
-        r.clip_to(self.image_thumb_rect)
-
-        # ignore rects smaller than this size
-        if min(r.h, r.w) < 3:
-            return
-
-        ra = r
-        ra = ra.scale_rect(self.scale)
-        ra = ra.move_rect(self.x0, self.y0)
-        ra = ra.valid_rect(self.w, self.h)
-        if self.zoommode:
-            self.canvas.delete(tk.ALL)
-            self.x0 = ra.left
-            self.y0 = ra.top
-            self.region_rect = ra
-            self.displayimage()
-            self.zoommode = False
-            self.zoomButton.deselect()
-            self.zooming = True
-        else:
-            self.drawrect(r)
-            self.crop_rects.append(ra)
-            self.n = self.n + 1
-        self.verify_params()
-        self.set_button_state()
-
-    def countour_mode(self):
-        if self.countour:
-            self.countour = False
-        else:
-            self.countour = True
-        self.displayimage()
+    def newfilename(self, filenum, ext=None):
+        return gui.Application.newfilename(self, filenum, ext or self.ext)
 
-    def zoom_mode(self):
-        if self.zoommode:
-            self.zoommode = False
-        else:
-            self.zoommode = True
-
-    def unzoom_image(self):
-        self.canvas.delete(tk.ALL)
-        self.zoommode = False
-        self.zoomButton.deselect()
-        self.x0 = 0
-        self.y0 = 0
-        self.region_rect = Rect((0, 0), (self.w, self.h))
-        self.zooming = False
-        self.displayimage()
-
-    def plus_box(self):
-        if self.n > 1:
-            self.canvas.delete(tk.ALL)
-            if self.crop_rects:
-                ra = self.crop_rects[self.n - 1]
-                self.crop_rects.pop()
-                self.n = self.n - 1
-                ra0 = self.crop_rects[self.n - 1]
-                ra0 = ra0.plus_rect(ra)
-                self.crop_rects[self.n - 1] = ra0
-                self.displayimage()
-                self.zoommode = False
-                self.zoomButton.deselect()
-
-    def redraw_rect(self):
-        for croparea in self.crop_rects:
-            self.drawrect(croparea.rescale_rect(self.scale, self.x0, self.y0))
-
-    def undo_last(self):
-        if (self.n > 0):
-            if self.canvas_rects:
-                r = self.canvas_rects.pop()
-                self.canvas.delete(r)
-            if self.crop_rects:
-                self.crop_rects.pop()
-            self.n = self.n - 1
-        self.set_button_state()
-
-    def drawrect(self, rect):
-        bbox = (rect.left, rect.top, rect.right, rect.bottom)
-        cr = self.canvas.create_rectangle(
-            bbox, activefill='', fill='red', stipple='gray25')
-        self.canvas_rects.append(cr)
-
-    def displayimage(self):
-        rr = (self.region_rect.left, self.region_rect.top, self.region_rect.right, self.region_rect.bottom)
-        self.image_thumb = self.image.crop(rr)
-        self.image_thumb.thumbnail(thumbsize, Image.ANTIALIAS)
-        if self.countour:
-            self.image_thumb = self.image_thumb.filter(ImageFilter.CONTOUR)
-
-        self.image_thumb_rect = Rect(self.image_thumb.size)
-
-        self.photoimage = ImageTk.PhotoImage(self.image_thumb)
-        w, h = self.image_thumb.size
-        self.canvas.configure(
-            width=(w + 2 * thumboffset),
-            height=(h + 2 * thumboffset))
-
-        self.canvas.create_image(
-            thumboffset,
-            thumboffset,
-            anchor=tk.NW,
-            image=self.photoimage)
-
-        x_scale = float(self.region_rect.w) / self.image_thumb_rect.w
-        y_scale = float(self.region_rect.h) / self.image_thumb_rect.h
-        self.scale = (x_scale, y_scale)
-        self.redraw_rect()
-        self.set_button_state()
-
-    def reset(self):
-        self.canvas.delete(tk.ALL)
-        self.zoommode = False
-        self.zoomButton.deselect()
-        self.zooming = False
-        self.countour = False
-        self.countourButton.deselect()
-        self.acbwmode = False
-        self.acbwButton.deselect()
-        self.canvas_rects = []
-        self.crop_rects = []
-        self.n = 0
-        self.region_rect = Rect((0, 0), (self.w, self.h))
-        self.x0 = 0
-        self.y0 = 0
-
-        self.displayimage()
-        self.verify_params()
-
-    def ac_bw_mode(self):
-        if self.acbwmode:
-            self.acbwmode = False
-        else:
-            self.acbwmode = True
-
-    def autocrop(self):
-        border = 255
-        rr = (self.region_rect.left, self.region_rect.top, self.region_rect.right, self.region_rect.bottom)
-        imp = self.image.crop(rr)
-        if self.acbwmode:
-            bw = imp.convert('1')
+    def files_mode(self):
+        if self.savefiles:
+            self.savefiles = False
         else:
-            bw = imp.convert('L')
-        bw = bw.filter(ImageFilter.MedianFilter)
-        bg = Image.new('1', imp.size, border)
-        diff = ImageChops.difference(bw, bg)
-        bbox = diff.getbbox()
-        brect = Rect((self.x0 + bbox[0], self.y0 + bbox[1]), (self.x0 + bbox[2], self.y0 + bbox[3]))
-        brect = brect.valid_rect(self.w, self.h)
-        self.crop_rects.append(brect)
-        self.n = self.n + 1
-        self.canvas.delete(tk.ALL)
-        self.displayimage()
-
-    def loadimage(self):
-        self.image = Image.open(self.filename)
-        print (self.image.size)
-        self.image_rect = Rect(self.image.size)
-        self.w = self.image_rect.w
-        self.h = self.image_rect.h
-        self.region_rect = Rect((0, 0), (self.w, self.h))
-
-        self.displayimage()
-        self.verify_params()
-
-    def newfilename(self, filenum):
-        f, e = os.path.splitext(self.filename)
-        return '%s__crop__%s.%s' % (f, filenum, self.ext)
-
-    def start_cropping(self):
+            self.savefiles = True
+
+    def crop_steps(self):
+        # reportlab is loaded with the first page
+        from cropper.book import Book
         cropcount = 0
-        self.verify_params()
-        pdf = Canvas(self.outfile, pageCompression=1)
-        width = round(self.w * 72.0 / self.dpi, 3)
-        height = round(self.h * 72.0 / self.dpi, 3)
-        pdf.setPageSize((width, height))
+        # every image of the session is a page of one pdf
+        if self.book is None:
+            self.book = Book(self.outfile, settings=self.settings)
+        boxes = []
+        filenames = []
         for croparea in self.crop_rects:
             cropcount += 1
             f = self.newfilename(cropcount)
             print (f, croparea)
-            self.crop(croparea, f)
-            wt = round(croparea.w * 72.0 / self.dpi, 3)
-            ht = round(croparea.h * 72.0 / self.dpi, 3)
-            x = round(croparea.left * 72.0 / self.dpi, 3)
-            y = height - round(croparea.bottom * 72.0 / self.dpi, 3)
-            pdf.drawImage(f, x, y, width=wt, height=ht)
-        pdf.showPage()
-        pdf.save()
-        for croparea in self.crop_rects:
-            self.clean_rect(croparea)
-        f = self.newfilename(0)
-        self.image.save(f)
-        self.quit()
-
-    def crop(self, croparea, filename):
-        ca = (croparea.left, croparea.top, croparea.right, croparea.bottom)
-        newimg = self.image.crop(ca)
-        divd = int(self.div / 2)
-        divw = int((croparea.w + divd) / self.div)
-        divh = int((croparea.h + divd) / self.div)
-        divsize = divw, divh
-        newimg.thumbnail(divsize, Image.ANTIALIAS)
-        newimg.save(filename)
-
-    def clean_rect(self, croparea):
+            boxes.append((croparea.left, croparea.top, croparea.right, croparea.bottom))
+            filenames.append(f if self.savefiles else None)
+        # pages are added in the export thread, in submission order
+        steps = [functools.partial(self.book.add_page, self.image, boxes,
+                                   self.dpi, self.div, self.ext, filenames)]
+        if self.savefiles:
+            steps.append(functools.partial(self.save_page, self.source,
+                                           list(self.crop_rects), self.cleanmargin,
+                                           self.newfilename(0)))
+        return steps
+
+    def finish(self):
+        if self.book:
+            self.exporter.submit(os.path.basename(self.outfile),
+                                 [functools.partial(self.save_book, self.book)])
+            self.book = None
+        gui.Application.finish(self)
+
+    def save_book(self, book):
+        book.save()
+        print (book.outfile)
+
+    def save_page(self, source, rects, margin, filename):
+        # runs in the export thread: no Tk calls here
+        # the page is copied a band of rows at a time, so a tiled source
+        # is read through its block cache instead of being decoded whole
+        image = source.image
+        w, h = image.size
+        page = Image.new(image.mode, (w, h))
+        for y in range(0, h, block_rows):
+            page.paste(image.crop((0, y, w, min(y + block_rows, h))), (0, y))
+        for croparea in rects:
+            self.clean_rect(page, croparea, margin)
+        save(page, filename, self.settings)
+
+    def clean_rect(self, page, croparea, margin):
         cab = croparea
-        cab = cab.addmargin_rect(self.cleanmargin, self.w, self.h)
+        cab = cab.addmargin_rect(margin, page.size[0], page.size[1])
         ca = (cab.left, cab.top, cab.right, cab.bottom)
         width = cab.w
         height = cab.h
-        if self.image.mode == 'RGB':
+        if page.mode == 'RGB':
             newimg = Image.new('RGB', (width, height), (255, 255, 255))
         else:
             newimg = Image.new('L', (width, height), 255)
-        self.image.paste(newimg, ca)
-
-
-class Rect(object):
-    def __init__(self, *args):
-        self.set_points(*args)
-
-    def set_points(self, *args):
-        if len(args) == 2:
-            pt1 = args[0]
-            pt2 = args[1]
-        elif len(args) == 1:
-            pt1 = (0, 0)
-            pt2 = args[0]
-        elif len(args) == 0:
-            pt1 = (0, 0)
-            pt2 = (0, 0)
-
-        x1, y1 = pt1
-        x2, y2 = pt2
-
-        self.left = min(x1, x2)
-        self.top = min(y1, y2)
-        self.right = max(x1, x2)
-        self.bottom = max(y1, y2)
-
-        self._update_dims()
-
-    def clip_to(self, containing_rect):
-        cr = containing_rect
-        self.top = max(self.top, cr.top + thumboffset)
-        self.bottom = min(self.bottom, cr.bottom + thumboffset)
-        self.left = max(self.left, cr.left + thumboffset)
-        self.right = min(self.right, cr.right + thumboffset)
-        self._update_dims()
-
-    def _update_dims(self):
-        """added to provide w and h dimensions."""
-
-        self.w = self.right - self.left
-        self.h = self.bottom - self.top
-
-    def scale_rect(self, scale):
-        x_scale = scale[0]
-        y_scale = scale[1]
-
-        r = Rect()
-        r.top = int((self.top - thumboffset) * y_scale + 0.5)
-        r.bottom = int((self.bottom - thumboffset) * y_scale + 0.5)
-        r.right = int((self.right - thumboffset) * x_scale + 0.5)
-        r.left = int((self.left - thumboffset) * x_scale + 0.5)
-        r._update_dims()
-
-        return r
-
-    def move_rect(self, x0, y0):
-        r = Rect()
-        r.top = int(self.top + y0)
-        r.bottom = int(self.bottom + y0)
-        r.right = int(self.right + x0)
-        r.left = int(self.left + x0)
-        r._update_dims()
-
-        return r
-
-    def rescale_rect(self, scale, x0, y0):
-        x_scale = scale[0]
-        y_scale = scale[1]
-
-        r = Rect()
-        r.top = int((self.top - y0) / y_scale + thumboffset)
-        r.bottom = int((self.bottom - y0) / y_scale + thumboffset)
-        r.right = int((self.right - x0) / x_scale + thumboffset)
-        r.left = int((self.left - x0) / x_scale + thumboffset)
-        r._update_dims()
-
-        return r
-
-    def plus_rect(self, r0):
-        r = Rect()
-        r.top = min(self.top, r0.top)
-        r.bottom = max(self.bottom, r0.bottom)
-        r.right = max(self.right, r0.right)
-        r.left = min(self.left, r0.left)
-        r._update_dims()
-
-        return r
-
-    def valid_rect(self, w, h):
-        r = Rect()
-        r.top = self.top
-        if r.top < 0:
-            r.top = 0
-        if r.top > h - 1:
-            r.top = h - 1
-        r.bottom = self.bottom
-        if r.bottom < 1:
-            r.bottom = 1
-        if r.bottom > h:
-            r.bottom = h
-        r.right = self.right
-        if r.right < 1:
-            r.right = 1
-        if r.right > w:
-            r.right = w
-        r.left = self.left
-        if r.left < 0:
-            r.left = 0
-        if r.left > w - 1:
-            r.left = w - 1
-        r._update_dims()
-
-        return r
-
-    def addmargin_rect(self, margin, width, height):
-        r = Rect()
-        r.top = self.top - margin
-        r.bottom = self.bottom + margin
-        r.right = self.right + margin
-        r.left = self.left - margin
-        r = r.valid_rect(width, height)
-        r._update_dims()
-
-        return r
-
-    def __repr__(self):
-        return '(%d,%d)-(%d,%d)' % (self.left,
-                                    self.top, self.right, self.bottom)
-
-def main(filename, dpi, iformat, pdfname):
-    app = Application(filename=filename, dpi=dpi, iformat=iformat, pdfname=pdfname)
-    app.master.title(PROGNAME)
+        page.paste(newimg, ca)
+
+
+def main(filenames, dpi, iformat, pdfname, savefiles, tilecache, settings):
+    app = Application(filenames=filenames, dpi=dpi, iformat=iformat, pdfname=pdfname, savefiles=savefiles, tilecache=tilecache, settings=settings)
     app.mainloop()
 
 
@@ -646,6 +234,33 @@ if __name__ == '__main__':
         type=str,
         default=None,
         help='output pdf name, default None')
-    parser.add_argument('filename', nargs='?', default=None, help='image file name')
+    parser.add_argument(
+        '-n',
+        '--nofiles',
+        action='store_true',
+        help='do not save crop and cleaned page images next to the pdf')
+    parser.add_argument(
+        '--book',
+        metavar='outfile',
+        type=str,
+        default=None,
+        help='build one pdf from all images without GUI, see --book x --help')
+    add_encoder_arguments(parser, multi=False)
+    parser.add_argument(
+        '--profile',
+        metavar='tracefile',
+        type=str,
+        default=None,
+        help='write a chrome trace of the hot paths at exit, see also $%s' % timing.env_var)
+    parser.add_argument(
+        '--tile-cache',
+        metavar='MB',
+        type=int,
+        default=default_tilecache,
+        help='memory for tiles of huge uncompressed tiff files, default 256')
+    parser.add_argument('filenames', nargs='*', help='image file names, one pdf page each')
     args = parser.parse_args()
-    main(args.filename, args.dpi, args.format, args.outfile)
+    if args.profile:
+        timing.enable(args.profile)
+    main(args.filenames, args.dpi, args.format, args.outfile, not args.nofiles, args.tile_cache,
+         encoder_settings(args))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import pytest
+from PIL import Image, ImageOps
+
+from benchmarks.synth import make_scan
+from cropper.autocrop import autocrop_box, autocrop_boxes
+
+pytest.importorskip('numpy')
+
+
+def content_box(image, box):
+    '''The exact bounds of the dark pixels inside box.'''
+    bbox = ImageOps.invert(image.crop(box).convert('L')).getbbox()
+    return (box[0] + bbox[0], box[1] + bbox[1], box[0] + bbox[2], box[1] + bbox[3])
+
+
+def near(a, b, tol):
+    return all(abs(x - y) <= tol for x, y in zip(a, b))
+
+
+@pytest.mark.parametrize('mode', ['1', 'L', 'RGB'])
+@pytest.mark.parametrize('size', [(1240, 1754), (2480, 3508)])
+def test_text_page_gives_one_box_per_column(mode, size):
+    image, columns = make_scan(size, mode, 'text', seed=1)
+    boxes = sorted(autocrop_boxes(image))
+    assert len(boxes) == len(columns)
+    for got, column in zip(boxes, sorted(columns)):
+        assert near(got, content_box(image, column), 2)
+
+
+def test_text_page_small_minarea_does_not_split_words():
+    image, columns = make_scan((1240, 1754), 'L', 'text', seed=2)
+    assert len(autocrop_boxes(image, minarea=100)) == len(columns)
+
+
+@pytest.mark.parametrize('mode', ['1', 'L', 'RGB'])
+def test_photo_page_gives_every_photo(mode):
+    image, photos = make_scan((1240, 1754), mode, 'photos', seed=1)
+    assert sorted(autocrop_boxes(image)) == sorted(photos)
+
+
+def test_blank_page():
+    image, _ = make_scan((1240, 1754), 'L', 'blank')
+    assert autocrop_boxes(image) == []
+    assert autocrop_box(image) is None
+
+
+def test_region_is_searched_only():
+    image, photos = make_scan((1240, 1754), 'L', 'photos', seed=1)
+    left, top, right, bottom = photos[0]
+    region = (0, 0, right + 8, bottom + 8)
+    assert autocrop_boxes(image, region) == [photos[0]]
+
+
+def test_strips_match_single_pass(monkeypatch):
+    import cropper.autocrop as autocrop
+    image, _ = make_scan((1240, 1754), 'L', 'photos', seed=3)
+    whole = autocrop_box(image)
+    monkeypatch.setattr(autocrop, 'strip_pixels', 1240 * 64)
+    assert autocrop_box(image) == whole
+
+
+def test_small_speck_is_dropped():
+    image = Image.new('L', (1000, 1000), 255)
+    image.paste(0, (100, 100, 400, 500))
+    image.paste(0, (900, 900, 904, 904))
+    assert autocrop_boxes(image) == [(100, 100, 400, 500)]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from PIL import Image, ImageDraw
+
+from cropper import classify
+from cropper.classify import BILEVEL, COLOR, GRAY, convert, otsu
+
+
+def with_share(mode, background, patch, share):
+    # a 100x100 image with share of its pixels set to patch
+    image = Image.new(mode, (100, 100), background)
+    ImageDraw.Draw(image).rectangle((0, 0, 99, int(share * 100) - 1), fill=patch)
+    return image
+
+
+def test_bilevel():
+    assert classify.classify(Image.new('1', (10, 10))) == BILEVEL
+    assert classify.classify(with_share('L', 255, 0, 0.5)) == BILEVEL
+    assert classify.classify(with_share('RGB', (255, 255, 255), (0, 0, 0), 0.5)) == BILEVEL
+
+
+def test_gray_threshold():
+    # mid tones above gray_ratio make a gray crop
+    assert classify.classify(with_share('L', 255, 128, 0.05)) == BILEVEL
+    assert classify.classify(with_share('L', 255, 128, 0.12)) == GRAY
+    # tones outside dark_level..light_level are not mid tones
+    assert classify.classify(with_share('L', 255, classify.light_level, 0.5)) == BILEVEL
+    assert classify.classify(with_share('L', 255, classify.dark_level - 1, 0.5)) == BILEVEL
+    assert classify.classify(with_share('RGB', (255, 255, 255), (128, 128, 128), 0.5)) == GRAY
+
+
+def test_color_threshold():
+    white = (255, 255, 255)
+    red = (200, 40, 40)
+    # one row is 1% of the pixels, above color_ratio
+    assert classify.classify(with_share('RGB', white, red, 0.01)) == COLOR
+    image = Image.new('RGB', (100, 100), white)
+    image.putpixel((5, 5), red)
+    assert classify.classify(image) == BILEVEL
+    # a small channel spread is not colour
+    tint = (128, 128 + classify.chroma_level - 1, 128)
+    assert classify.classify(with_share('RGB', white, tint, 0.5)) == GRAY
+
+
+def test_otsu():
+    hist = [0] * 256
+    hist[30] = 500
+    hist[220] = 1500
+    assert 30 <= otsu(hist) < 220
+
+
+def test_convert_modes():
+    assert convert(with_share('L', 255, 0, 0.5)).mode == '1'
+    assert convert(with_share('RGB', (255, 255, 255), (128, 128, 128), 0.5)).mode == 'L'
+    assert convert(with_share('RGB', (255, 255, 255), (200, 40, 40), 0.5)).mode == 'RGB'
+    assert convert(with_share('L', 255, 128, 0.5), COLOR).mode == 'RGB'
+    bilevel = convert(with_share('L', 250, 10, 0.5))
+    assert bilevel.getpixel((0, 0)) == 0 and bilevel.getpixel((0, 99)) == 255
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pytest
+from PIL import Image, ImageDraw
+
+from benchmarks.synth import make_scan
+from cropper.deskew import AngleCache, cache_name, estimate_angle, rotate, straighten
+
+
+def clipping(mode='L'):
+    # a page of text lines with a frame, on a larger white sheet
+    image, boxes = make_scan((600, 800), mode, 'text', seed=4)
+    ImageDraw.Draw(image).rectangle((20, 20, 579, 779), outline=0, width=3)
+    sheet = Image.new(image.mode, (1000, 1200), 255 if mode == 'L' else (255, 255, 255))
+    sheet.paste(image, (200, 200))
+    return sheet
+
+
+@pytest.mark.parametrize('angle', [-6.0, -1.5, 2.0, 7.5])
+def test_estimate_angle(angle):
+    # a page turned by angle is straightened by -angle
+    assert abs(estimate_angle(rotate(clipping(), angle)) + angle) <= 0.2
+
+
+def test_straight_page_is_kept():
+    image = clipping()
+    assert abs(estimate_angle(image)) < 0.1
+    box = (0, 0) + image.size
+    assert straighten(image, box).size == image.size
+
+
+def test_straighten_trims_corners():
+    image = rotate(clipping('RGB'), 4.0)
+    out = straighten(image, (0, 0) + image.size)
+    assert out.mode == 'RGB'
+    assert out.size[0] < image.size[0] and out.size[1] < image.size[1]
+    kept = straighten(image, (0, 0) + image.size, trim=False)
+    assert kept.size == image.size
+
+
+def test_angle_cache(tmpdir):
+    filename = str(tmpdir.join('page.jpg'))
+    image = rotate(clipping(), 3.0)
+    box = (0, 0) + image.size
+    cache = AngleCache(filename, image.size)
+    straighten(image, box, cache)
+    cache.save()
+    assert tmpdir.join('page.jpg.deskew.json').check()
+    angle = AngleCache(filename, image.size).get(box)
+    assert abs(angle + 3.0) <= 0.2
+    # another size means other boxes
+    assert AngleCache(filename, (10, 10)).get(box) is None
+    assert cache_name(filename).endswith('.deskew.json')
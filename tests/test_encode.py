@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import argparse
+import multiprocessing
+import sys
+
+import pytest
+from PIL import Image
+
+from cropper.encode import (add_encoder_arguments, encoder_settings, output_exts,
+                            save_formats)
+
+
+def gray_page():
+    return Image.linear_gradient('L').resize((300, 200))
+
+
+def save_two(dirname):
+    save_formats(gray_page(), [dirname + '/child.png', dirname + '/child.tif'])
+    return True
+
+
+def test_save_formats_writes_every_format(tmpdir):
+    names = [str(tmpdir.join('crop.' + ext)) for ext in ('png', 'jpg', 'tif')]
+    save_formats(gray_page(), names, {'JPEG': {'quality': 50}})
+    assert [Image.open(f).format for f in names] == ['PNG', 'JPEG', 'TIFF']
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs fork')
+def test_save_formats_in_forked_child(tmpdir):
+    # the parent's encoder threads are not in the child
+    save_two(str(tmpdir))
+    pool = multiprocessing.get_context('fork').Pool(1)
+    try:
+        assert pool.apply_async(save_two, (str(tmpdir),)).get(timeout=30)
+    finally:
+        pool.terminate()
+
+
+def test_encoder_settings_from_arguments():
+    parser = argparse.ArgumentParser()
+    add_encoder_arguments(parser)
+    args = parser.parse_args(['-F', 'jpg,png', '-q', '80', '--png-level', '1'])
+    settings = encoder_settings(args)
+    assert settings['JPEG'] == {'quality': 80}
+    assert settings['PNG'] == {'compress_level': 1}
+    assert output_exts(args) == ['jpg', 'png']
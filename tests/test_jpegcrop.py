@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import os
+import stat
+
+import pytest
+from PIL import Image, ImageChops
+
+from benchmarks.synth import make_scan
+from cropper import jpegcrop
+from cropper.batch import save_crops
+from cropper.jpegcrop import crop_grid, lossless_crop, mcu_size, on_grid, snap_box
+
+
+def write_jpeg(tmpdir, mode, subsampling=2):
+    image, boxes = make_scan((320, 240), mode, 'photos', seed=2)
+    filename = str(tmpdir.join('page.jpg'))
+    image.save(filename, subsampling=subsampling)
+    return Image.open(filename)
+
+
+def fake_jpegtran(tmpdir):
+    # records its arguments instead of cropping
+    script = tmpdir.join('jpegtran')
+    script.write('#!/bin/sh\necho "$@" > "%s"\n' % tmpdir.join('args'))
+    os.chmod(str(script), stat.S_IRWXU)
+    return str(script)
+
+
+def test_mcu_size(tmpdir):
+    assert mcu_size(write_jpeg(tmpdir, 'RGB', 2)) == (16, 16)
+    assert mcu_size(write_jpeg(tmpdir, 'RGB', 0)) == (8, 8)
+    assert mcu_size(write_jpeg(tmpdir, 'L')) == (8, 8)
+    assert mcu_size(Image.new('L', (8, 8))) is None
+
+
+def test_on_grid():
+    assert on_grid((32, 16, 101, 77), (16, 16))
+    assert not on_grid((40, 16, 101, 77), (16, 16))
+    assert on_grid((40, 16, 101, 77), (8, 8))
+    assert not on_grid((40, 20, 101, 77), (8, 8))
+
+
+def test_snap_box():
+    assert snap_box((40, 20, 101, 77), (16, 16)) == (32, 16, 101, 77)
+    assert snap_box((32, 16, 101, 77), (16, 16)) == (32, 16, 101, 77)
+    assert on_grid(snap_box((45, 21, 101, 77), (8, 8)), (8, 8))
+
+
+def test_crop_grid(tmpdir, monkeypatch):
+    monkeypatch.setattr(jpegcrop, 'jpegtran', fake_jpegtran(tmpdir))
+    image = write_jpeg(tmpdir, 'RGB', 2)
+    assert crop_grid(image, ['a.png', 'a.jpg']) == (16, 16)
+    assert crop_grid(image, ['a.png']) is None
+    monkeypatch.setattr(jpegcrop, 'jpegtran', None)
+    assert crop_grid(image, ['a.jpg']) is None
+
+
+def test_box_off_grid_is_not_cut(tmpdir, monkeypatch):
+    monkeypatch.setattr(jpegcrop, 'jpegtran', fake_jpegtran(tmpdir))
+    image = write_jpeg(tmpdir, 'RGB', 2)
+    out = str(tmpdir.join('crop.jpg'))
+    assert lossless_crop(image, (40, 16, 101, 77), out) is None
+    assert not tmpdir.join('args').check()
+    assert lossless_crop(image, (32, 16, 101, 77), out) == (32, 16, 101, 77)
+    assert '-crop 69x61+32+16' in tmpdir.join('args').read()
+
+
+def test_other_format_is_not_cut(tmpdir, monkeypatch):
+    monkeypatch.setattr(jpegcrop, 'jpegtran', fake_jpegtran(tmpdir))
+    image = write_jpeg(tmpdir, 'L')
+    assert lossless_crop(image, (0, 0, 64, 64), str(tmpdir.join('crop.png'))) is None
+
+
+def test_box_past_image_is_not_cut(tmpdir, monkeypatch):
+    monkeypatch.setattr(jpegcrop, 'jpegtran', fake_jpegtran(tmpdir))
+    image = write_jpeg(tmpdir, 'L')
+    assert lossless_crop(image, (0, 0, 321, 64), str(tmpdir.join('crop.jpg'))) is None
+
+
+def test_batch_snaps_boxes(tmpdir, monkeypatch):
+    # the jpeg is cut by jpegtran, the png alongside gets the same box
+    monkeypatch.setattr(jpegcrop, 'jpegtran', fake_jpegtran(tmpdir))
+    image = write_jpeg(tmpdir, 'RGB', 2)
+    save_crops(image, image.filename, [(40, 20, 101, 77)],
+               {'lossless': True, 'exts': ['jpg', 'png']})
+    assert '-crop 69x61+32+16' in tmpdir.join('args').read()
+    assert Image.open(str(tmpdir.join('page__crop__1.png'))).size == (69, 61)
+
+
+@pytest.mark.skipif(jpegcrop.jpegtran is None, reason='jpegtran is not installed')
+@pytest.mark.parametrize('mode', ['L', 'RGB'])
+def test_real_jpegtran_keeps_pixels(tmpdir, mode):
+    # without chroma subsampling every decoded pixel depends on its own
+    # block only, so the cut file decodes to the crop of the source
+    image = write_jpeg(tmpdir, mode, 0)
+    box = snap_box((37, 21, 250, 201), mcu_size(image))
+    out = str(tmpdir.join('crop.jpg'))
+    assert lossless_crop(image, box, out) == box
+    crop = Image.open(out)
+    crop.load()
+    assert crop.size == (box[2] - box[0], box[3] - box[1])
+    assert ImageChops.difference(crop, image.crop(box)).getbbox() is None
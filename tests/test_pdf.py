@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import io
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from cropper.classify import convert
+
+pytest.importorskip('reportlab')
+pypdf = pytest.importorskip('pypdf')
+
+from reportlab.pdfgen import canvas  # noqa: E402
+
+from cropper.pdf import draw_crops, points  # noqa: E402
+
+
+def page_pdf(image, boxes, settings):
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=(points(image.size[0], 300),
+                                       points(image.size[1], 300)))
+    draw_crops(pdf, image, boxes, 300, settings=settings)
+    pdf.showPage()
+    pdf.save()
+    return pypdf.PdfReader(io.BytesIO(buf.getvalue())).pages[0]
+
+
+def text_page():
+    image = Image.new('L', (400, 300), 255)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((20, 30, 120, 80), fill=0)
+    draw.text((150, 150), 'Hello', fill=0)
+    return image
+
+
+def xobjects(page):
+    return [v.get_object() for v in page['/Resources']['/XObject'].values()]
+
+
+def test_bilevel_crop_is_ccitt():
+    image = text_page()
+    box = (10, 10, 390, 290)
+    page = page_pdf(image, [box], {'classify': True})
+    [xobject] = xobjects(page)
+    assert xobject['/Filter'] == '/CCITTFaxDecode'
+    assert xobject['/BitsPerComponent'] == 1
+    assert (xobject['/Width'], xobject['/Height']) == (380, 280)
+    parms = xobject['/DecodeParms']
+    assert parms['/K'] == -1
+    assert (parms['/Columns'], parms['/Rows']) == (380, 280)
+    # 0 bits are black
+    assert not parms.get('/BlackIs1', False)
+    [embedded] = page.images
+    expect = convert(image.crop(box))
+    assert expect.mode == '1'
+    assert ImageChops.difference(embedded.image.convert('L'),
+                                 expect.convert('L')).getbbox() is None
+
+
+def test_gray_crop_is_not_ccitt():
+    image = Image.linear_gradient('L').resize((300, 300))
+    page = page_pdf(image, [(0, 0, 300, 300)], {'classify': True})
+    [xobject] = xobjects(page)
+    assert xobject['/Filter'] != '/CCITTFaxDecode'
+    assert xobject['/BitsPerComponent'] == 8
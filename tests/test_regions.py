@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from cropper import regions
+from cropper.rect import Rect
+from cropper.regions import Regions
+
+
+def random_boxes(n, w=2000, h=3000, seed=0):
+    rnd = random.Random(seed)
+    boxes = []
+    for i in range(n):
+        left = rnd.randint(-50, w)
+        top = rnd.randint(-50, h)
+        boxes.append((left, top, left + rnd.randint(1, 400), top + rnd.randint(1, 400)))
+    return boxes
+
+
+@pytest.fixture(params=['loop', 'numpy'])
+def path(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+        monkeypatch.setattr(regions, 'vector_min', 1)
+    else:
+        monkeypatch.setattr(regions, 'vector_min', 10 ** 9)
+    return request.param
+
+
+def test_list_behaviour():
+    r = Regions([(1, 2, 3, 4), Rect((5, 6), (7, 8))])
+    assert len(r) == 2 and r
+    assert r[-1].box() == (5, 6, 7, 8)
+    r[0] = (10, 20, 30, 40)
+    assert [rect.box() for rect in r] == [(10, 20, 30, 40), (5, 6, 7, 8)]
+    assert r.pop(0).box() == (10, 20, 30, 40)
+    assert r.boxes() == [(5, 6, 7, 8)]
+    with pytest.raises(IndexError):
+        r[1]
+    r.clear()
+    assert not r
+
+
+def test_to_canvas_matches_rect(path):
+    boxes = random_boxes(50)
+    r = Regions(boxes)
+    for scale, x0, y0 in [((1.0, 1.0), 0, 0), ((2.5, 2.5), 100, 37), ((0.5, 0.75), -3, 9)]:
+        got = r.to_canvas(scale, x0, y0)
+        assert got == [Rect.from_box(b).rescale_rect(scale, x0, y0).box() for b in boxes]
+        assert r.to_canvas(scale, x0, y0, start=45) == got[45:]
+
+
+def test_clip_matches_rect(path):
+    boxes = random_boxes(50, seed=1)
+    r = Regions()
+    r.add_boxes(boxes, 1500, 2500)
+    assert r.boxes() == [Rect.from_box(b).valid_rect(1500, 2500).box() for b in boxes]
+
+
+def test_clip_from_start(path):
+    boxes = random_boxes(50, seed=2)
+    r = Regions(boxes)
+    start = r.add_boxes([(-5, -5, 5000, 5000)], 100, 100)
+    assert start == 50
+    assert r.boxes()[:50] == boxes
+    assert r[50].box() == (0, 0, 100, 100)
+
+
+def test_union():
+    r = Regions([(0, 0, 10, 10), (50, 60, 70, 80), (5, 5, 6, 6)])
+    assert r.union(0, 1).box() == (0, 0, 70, 80)
+    assert r.boxes() == [(0, 0, 70, 80), (5, 5, 6, 6)]
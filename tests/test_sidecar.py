@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+
+from cropper.sidecar import (Index, file_hash, read_sidecar, scale_boxes,
+                             sidecar_current, sidecar_name, write_sidecar)
+
+
+def make_file(tmpdir, data=b'scan'):
+    filename = str(tmpdir.join('page.jpg'))
+    with open(filename, 'wb') as f:
+        f.write(data)
+    return filename
+
+
+def test_write_and_read(tmpdir):
+    filename = make_file(tmpdir)
+    write_sidecar(filename, (100, 200), [(1, 2, 3, 4)])
+    data = read_sidecar(filename)
+    assert data['rects'] == [(1, 2, 3, 4)]
+    assert data['size'] == [100, 200]
+    assert data['hash'] == file_hash(filename)
+    assert not os.path.exists(sidecar_name(filename) + '.tmp')
+
+
+def test_missing_or_broken_sidecar(tmpdir):
+    filename = make_file(tmpdir)
+    assert read_sidecar(filename) is None
+    with open(sidecar_name(filename), 'w') as f:
+        f.write('{')
+    assert read_sidecar(filename) is None
+
+
+def test_current_after_touch_but_not_after_change(tmpdir):
+    filename = make_file(tmpdir)
+    write_sidecar(filename, (100, 200), [])
+    data = read_sidecar(filename)
+    assert sidecar_current(filename, data)
+    os.utime(filename, (1, 1))
+    assert sidecar_current(filename, data)
+    assert not sidecar_current(filename, data, digest='0' * 40)
+    make_file(tmpdir, b'rescan')
+    assert not sidecar_current(filename, data)
+
+
+def test_scale_boxes():
+    assert scale_boxes([(10, 20, 30, 40)], (100, 100), (100, 100)) == [(10, 20, 30, 40)]
+    assert scale_boxes([(10, 20, 30, 40)], (100, 100), (200, 50)) == [(20, 10, 60, 20)]
+
+
+def test_index_skips_unchanged_files(tmpdir):
+    filename = make_file(tmpdir)
+    out = str(tmpdir.join('page__crop__1.jpg'))
+    open(out, 'w').close()
+    index = Index(str(tmpdir))
+    assert not index.is_current(filename, 'spec')
+    index.update(filename, 'spec', [out])
+    index.save()
+    index = Index(str(tmpdir))
+    assert index.is_current(filename, 'spec')
+    assert not index.is_current(filename, 'other spec')
+    os.remove(out)
+    assert not index.is_current(filename, 'spec')
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import random
+
+from cropper.regions import Regions
+from cropper.spatial import GridIndex, overlaps, union
+
+
+def random_boxes(n, size=400, seed=0):
+    rnd = random.Random(seed)
+    boxes = []
+    for i in range(n):
+        left = rnd.randint(0, 3000)
+        top = rnd.randint(0, 3000)
+        boxes.append((left, top, left + rnd.randint(1, size), top + rnd.randint(1, size)))
+    return boxes
+
+
+def brute_merge(boxes):
+    # merge until no two boxes overlap, keeping the place of the first
+    groups = [(i, box) for i, box in enumerate(boxes)]
+    changed = True
+    while changed:
+        changed = False
+        for a in range(len(groups)):
+            for b in range(a + 1, len(groups)):
+                if overlaps(groups[a][1], groups[b][1]):
+                    groups[a] = (min(groups[a][0], groups[b][0]),
+                                 union(groups[a][1], groups[b][1]))
+                    del groups[b]
+                    changed = True
+                    break
+            if changed:
+                break
+    return [box for i, box in sorted(groups)]
+
+
+def test_near_finds_every_overlap():
+    boxes = random_boxes(300) + [(0, 0, 3400, 3400)]
+    grid = GridIndex(boxes)
+    assert len(boxes) - 1 in grid.large
+    for query in random_boxes(100, 800, seed=1):
+        found = grid.near(query)
+        for i, box in enumerate(boxes):
+            if overlaps(box, query):
+                assert i in found
+
+
+def test_remove():
+    boxes = random_boxes(50)
+    grid = GridIndex(boxes)
+    for i, box in enumerate(boxes):
+        grid.remove(i, box)
+    assert not grid.cells and not grid.large
+
+
+def test_hit_is_topmost():
+    r = Regions([(0, 0, 100, 100), (50, 50, 150, 150), (400, 400, 500, 500)])
+    assert r.hit(75, 75) == 1
+    assert r.hit(10, 10) == 0
+    assert r.hit(300, 300) is None
+    assert r.hit(397, 397, tol=3) == 2
+
+
+def test_hit_on_cell_boundary():
+    # the right and bottom edges fall on the grid lines
+    r = Regions([(0, 0, 64, 64), (128, 0, 192, 64)])
+    assert r.grid().cell == 64
+    assert r.hit(64, 10) == 0
+    assert r.hit(10, 64) == 0
+    assert r.hit(64, 64) == 0
+    assert r.hit(66, 10, tol=2) == 0
+    assert r.hit(67, 10, tol=2) is None
+
+
+def test_hit_matches_closed_boxes():
+    rnd = random.Random(5)
+    boxes = [(rnd.randint(0, 40) * 16, rnd.randint(0, 40) * 16) for i in range(60)]
+    boxes = [(x, y, x + rnd.randint(1, 8) * 16, y + rnd.randint(1, 8) * 16) for x, y in boxes]
+    r = Regions(boxes)
+    for i in range(2000):
+        x, y, tol = rnd.randint(0, 800), rnd.randint(0, 800), rnd.randint(0, 3)
+        expect = [j for j, b in enumerate(boxes)
+                  if b[0] - tol <= x <= b[2] + tol and b[1] - tol <= y <= b[3] + tol]
+        assert r.hit(x, y, tol) == (max(expect) if expect else None)
+
+
+def test_index_follows_edits():
+    boxes = random_boxes(100, seed=2)
+    r = Regions(boxes)
+    r.hit(0, 0)
+    r.append((3500, 3500, 3600, 3600))
+    r[0] = (3700, 3700, 3800, 3800)
+    r.pop()
+    r.pop(5)
+    for x, y in [(3750, 3750), (3550, 3550)] + [(b[0], b[1]) for b in r.boxes()]:
+        expect = [i for i, b in enumerate(r.boxes())
+                  if b[0] <= x <= b[2] and b[1] <= y <= b[3]]
+        assert r.hit(x, y) == (max(expect) if expect else None)
+
+
+def test_merge_overlapping():
+    for seed in range(5):
+        boxes = random_boxes(150, seed=seed)
+        r = Regions(boxes)
+        expect = brute_merge(boxes)
+        assert r.merge_overlapping() == len(boxes) - len(expect)
+        assert r.boxes() == expect
+
+
+def test_merge_chain():
+    # each box only touches the next, the grown box has to look again
+    r = Regions([(0, 0, 10, 10), (1000, 0, 1010, 10), (9, 0, 1001, 5)])
+    assert r.merge_overlapping() == 2
+    assert r.boxes() == [(0, 0, 1010, 10)]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import pytest
+from PIL import Image, ImageChops
+
+from benchmarks.synth import make_scan
+from cropper.template import make_template, template_boxes
+from cropper.tiled import open_tiled
+
+pytest.importorskip('numpy')
+
+
+def shifted(image, dx, dy):
+    out = Image.new(image.mode, image.size, 255)
+    out.paste(ImageChops.offset(image, dx, dy).crop((max(dx, 0), max(dy, 0),
+                                                    image.size[0] + min(dx, 0),
+                                                    image.size[1] + min(dy, 0))),
+              (max(dx, 0), max(dy, 0)))
+    return out
+
+
+def near(a, b, tol):
+    return all(abs(x - y) <= tol for x, y in zip(a, b))
+
+
+def test_boxes_follow_scanner_drift():
+    image, boxes = make_scan((1240, 1754), 'L', 'photos', seed=1)
+    template = make_template(image, boxes)
+    for got, box in zip(template_boxes(template, shifted(image, 23, -17)), boxes):
+        assert near(got, (box[0] + 23, box[1] - 17, box[2] + 23, box[3] - 17), 4)
+
+
+def test_content_anchor():
+    image, boxes = make_scan((1240, 1754), 'L', 'photos', seed=1)
+    template = make_template(image, boxes, 'content')
+    for got, box in zip(template_boxes(template, shifted(image, 40, 30)), boxes):
+        assert near(got, (box[0] + 40, box[1] + 30, box[2] + 40, box[3] + 30), 2)
+
+
+@pytest.mark.parametrize('mode', ['1', 'L'])
+def test_template_from_tiled_source(tmpdir, mode):
+    image, boxes = make_scan((1240, 1754), mode, 'photos', seed=1)
+    filename = str(tmpdir.join('page.tif'))
+    image.save(filename)
+    tiled = open_tiled(filename, 1 << 24)
+    assert tiled is not None
+    template = make_template(tiled, boxes)
+    for got, box in zip(template_boxes(template, image), boxes):
+        assert near(got, box, 2)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import pytest
+from PIL import Image, ImageChops
+
+from benchmarks.synth import make_scan
+from cropper import tiled
+from cropper.tiled import open_tiled
+
+
+def same(a, b):
+    return a.mode == b.mode and a.size == b.size and \
+        ImageChops.difference(a.convert('L'), b.convert('L')).getbbox() is None
+
+
+def write_tiff(tmpdir, mode, compression=None):
+    image, boxes = make_scan((500, 700), mode, 'photos', seed=3)
+    filename = str(tmpdir.join('page.tif'))
+    image.save(filename, compression=compression)
+    return Image.open(filename), filename
+
+
+@pytest.mark.parametrize('mode', ['1', 'L', 'RGB'])
+def test_crop_matches_pil(tmpdir, monkeypatch, mode):
+    # small blocks, so crops cross several of them
+    monkeypatch.setattr(tiled, 'block_rows', 64)
+    image, filename = write_tiff(tmpdir, mode)
+    source = open_tiled(filename)
+    assert source.mode == image.mode and source.size == image.size
+    assert len(source.blocks) > 1
+    for box in [(0, 0, 500, 700), (13, 60, 301, 200), (499, 699, 500, 700)]:
+        assert same(source.crop(box), image.crop(box))
+
+
+def test_reduce_and_resize(tmpdir, monkeypatch):
+    monkeypatch.setattr(tiled, 'block_rows', 64)
+    image, filename = write_tiff(tmpdir, 'L')
+    source = open_tiled(filename)
+    assert same(source.reduce(4), image.reduce(4))
+    box = (100, 150, 300, 450)
+    assert same(source.resize((50, 75), Image.BILINEAR, box=box),
+                image.resize((50, 75), Image.BILINEAR, box=box))
+
+
+def test_block_cache_is_bounded(tmpdir, monkeypatch):
+    monkeypatch.setattr(tiled, 'block_rows', 64)
+    image, filename = write_tiff(tmpdir, 'L')
+    # room for two blocks of 500x64 gray pixels
+    source = open_tiled(filename, cache_bytes=2 * 500 * 64)
+    source.crop((0, 0, 500, 700))
+    assert len(source.cache) <= 2
+
+
+def test_compressed_tiff_is_not_tiled(tmpdir):
+    image, filename = write_tiff(tmpdir, 'L', 'tiff_lzw')
+    assert open_tiled(filename) is None
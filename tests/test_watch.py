@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+from PIL import Image
+
+from benchmarks.synth import make_scan
+from cropper import watch
+from cropper.sidecar import read_sidecar, sidecar_name
+from cropper.watch import Poller, free_name, review_reason, scan_tree, watch_image
+
+pytest.importorskip('numpy')
+
+autoopts = {'multi': True}
+
+
+def folders(tmpdir):
+    return [str(tmpdir.mkdir(name)) for name in ('hot', 'cropped', 'review')]
+
+
+def arrive(hotdir, relname, layout='photos'):
+    filename = os.path.join(hotdir, relname)
+    if not os.path.isdir(os.path.dirname(filename)):
+        os.makedirs(os.path.dirname(filename))
+    image, boxes = make_scan((620, 877), 'L', layout, seed=5)
+    image.save(filename)
+    return filename, boxes
+
+
+def run(filename, relname, outdir, reviewdir):
+    return watch_image((filename, relname, autoopts, outdir, reviewdir))
+
+
+def test_review_reason():
+    image = Image.new('L', (100, 100))
+    assert review_reason(image, []) == 'no content found'
+    assert review_reason(image, [(0, 0, 1, 1)] * (watch.max_blocks + 1)) == \
+        '%d blocks' % (watch.max_blocks + 1)
+    assert review_reason(image, [(0, 0, 100, 99)]) == 'content fills the page'
+    assert review_reason(image, [(10, 10, 60, 60), (70, 70, 90, 90)]) is None
+
+
+def test_free_name(tmpdir):
+    filename = str(tmpdir.join('page.jpg'))
+    assert free_name(filename) == filename
+    tmpdir.join('page.jpg').write('')
+    assert free_name(filename) == str(tmpdir.join('page-1.jpg'))
+    # a sidecar left without its scan also takes the name
+    tmpdir.join(os.path.basename(sidecar_name(str(tmpdir.join('page-1.jpg'))))).write('{}')
+    assert free_name(filename) == str(tmpdir.join('page-2.jpg'))
+
+
+def test_scan_tree(tmpdir):
+    hotdir, outdir, reviewdir = folders(tmpdir)
+    for name in ('b.jpg', 'a.png', 'sub/c.tif', '.hidden.jpg', 'a__crop__1.png', 'notes.txt'):
+        path = os.path.join(hotdir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        open(path, 'w').close()
+    os.makedirs(os.path.join(hotdir, 'out'))
+    open(os.path.join(hotdir, 'out', 'd.jpg'), 'w').close()
+    found = scan_tree(hotdir, set([os.path.abspath(os.path.join(hotdir, 'out'))]))
+    assert [os.path.relpath(f, hotdir) for f in found] == \
+        ['a.png', 'b.jpg', os.path.join('sub', 'c.tif')]
+
+
+def test_page_is_cropped_into_the_output_tree(tmpdir):
+    hotdir, outdir, reviewdir = folders(tmpdir)
+    relname = os.path.join('box1', 'page.png')
+    filename, boxes = arrive(hotdir, relname)
+    result = run(filename, relname, outdir, reviewdir)
+    dest = os.path.join(outdir, relname)
+    assert result == (filename, dest, result[2], None, None)
+    assert len(result[2]) == len(boxes)
+    assert all(os.path.exists(f) for f in result[2])
+    assert not os.path.exists(filename) and os.path.exists(dest)
+    assert len(read_sidecar(dest)['rects']) == len(boxes)
+
+
+def test_name_collision_in_output(tmpdir):
+    hotdir, outdir, reviewdir = folders(tmpdir)
+    filename, boxes = arrive(hotdir, 'page.png')
+    run(filename, 'page.png', outdir, reviewdir)
+    # a second scan with the same name does not overwrite the first
+    filename, boxes = arrive(hotdir, 'page.png')
+    result = run(filename, 'page.png', outdir, reviewdir)
+    assert result[1] == os.path.join(outdir, 'page-1.png')
+    assert all(os.path.basename(f).startswith('page-1__crop__') for f in result[2])
+    assert os.path.exists(os.path.join(outdir, 'page.png'))
+    assert os.path.exists(sidecar_name(os.path.join(outdir, 'page-1.png')))
+
+
+def test_blank_page_goes_to_review(tmpdir):
+    hotdir, outdir, reviewdir = folders(tmpdir)
+    filename, boxes = arrive(hotdir, 'blank.png', 'blank')
+    result = run(filename, 'blank.png', outdir, reviewdir)
+    dest = os.path.join(reviewdir, 'blank.png')
+    assert result == (filename, dest, [], 'no content found', None)
+    assert os.path.exists(dest) and not os.path.exists(filename)
+    assert read_sidecar(dest)['rects'] == []
+    assert os.listdir(outdir) == []
+
+
+def test_broken_scan_goes_to_review(tmpdir):
+    hotdir, outdir, reviewdir = folders(tmpdir)
+    filename = os.path.join(hotdir, 'broken.jpg')
+    with open(filename, 'wb') as f:
+        f.write(b'not a jpeg')
+    result = run(filename, 'broken.jpg', outdir, reviewdir)
+    assert result[1] == os.path.join(reviewdir, 'broken.jpg') and result[4]
+    assert not os.path.exists(sidecar_name(result[1]))
+
+
+def test_scan_already_done(tmpdir):
+    hotdir, outdir, reviewdir = folders(tmpdir)
+    filename = os.path.join(hotdir, 'gone.png')
+    assert run(filename, 'gone.png', outdir, reviewdir) == (filename, None, [], None, None)
+
+
+def test_poller_waits_for_a_steady_file(tmpdir):
+    hotdir, outdir, reviewdir = folders(tmpdir)
+    poller = Poller(hotdir, interval=0)
+    filename = os.path.join(hotdir, 'page.png')
+    with open(filename, 'wb') as f:
+        f.write(b'x' * 10)
+    assert poller.check([filename]) == []
+    # still being written
+    with open(filename, 'ab') as f:
+        f.write(b'x' * 10)
+    assert poller.check([filename]) == []
+    assert poller.check([filename]) == [filename]
+    # gone files are forgotten
+    os.remove(filename)
+    assert poller.check([filename]) == []
+    assert poller.seen == {}
+
+
+def test_poller_events(tmpdir):
+    hotdir, outdir, reviewdir = folders(tmpdir)
+    filename, boxes = arrive(hotdir, 'page.png')
+    events = Poller(hotdir, interval=0).events()
+    assert next(events) == filename
+
+
+def test_watcher_falls_back_to_polling(tmpdir, monkeypatch):
+    hotdir, outdir, reviewdir = folders(tmpdir)
+
+    def no_inotify(*args):
+        raise OSError('inotify is not available')
+    monkeypatch.setattr(watch.Inotify, '__init__', no_inotify)
+    watcher = watch.Watcher(hotdir, outdir, reviewdir, autoopts, processes=1)
+    assert type(watcher.source) is Poller
+    assert type(watch.Watcher(hotdir, outdir, reviewdir, autoopts, processes=1,
+                              poll=True).source) is Poller